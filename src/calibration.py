@@ -0,0 +1,260 @@
+"""
+Streaming model evaluation: calibration and accuracy on held-out positions in one pass.
+
+The held-out positions file is read chunk by chunk (as in src/predict.py), and every chunk is
+folded into fixed-size running sums, so memory does not grow with the number of positions:
+
+  - overall Brier score (= MSE of the expected score), log loss, R^2 and mean prediction/outcome;
+  - a reliability curve: predictions binned into equal-width probability bins, with the mean
+    prediction and mean outcome per bin;
+  - the same scores per move-number bucket and per rating band (lower of the two ratings).
+
+The outcome is regression_score (1 win, 0.5 draw, 0 loss for the side to move); log loss treats
+it as a soft label. The report is a small JSON file.
+
+Usage:
+    PYTHONPATH=. python src/calibration.py --model models/v1.joblib --input data/heldout_positions.parquet \
+        --output reports/v1_calibration.json
+"""
+
+import argparse
+import json
+import pathlib
+import time
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from src import partitions
+from src.partitions import NO_RATING
+from src.predict import KEY_COLS, featurize_chunk, iter_position_chunks, predict_rows
+from src.v1_regression_model import TARGET_COL, load_model
+
+_EPS = 1e-15
+# Running sums kept per group: rows, predictions, outcomes, squared errors, log losses.
+_N, _PRED, _OUTCOME, _SQ_ERR, _LOG_LOSS = range(5)
+
+
+def _scores(sums: np.ndarray) -> dict[str, float | int]:
+    n = int(sums[_N])
+    if n == 0:
+        return {"rows": 0}
+    return {
+        "rows": n,
+        "brier": sums[_SQ_ERR] / n,
+        "log_loss": sums[_LOG_LOSS] / n,
+        "mean_prediction": sums[_PRED] / n,
+        "mean_outcome": sums[_OUTCOME] / n,
+    }
+
+
+class CalibrationReport:
+    """
+    One-pass accumulators for calibration and accuracy of win-probability predictions.
+
+    Example:
+        report = CalibrationReport(n_bins=20)
+        for chunk in chunks:
+            report.update(predicted, outcome, move_number=..., rating=...)
+        report.to_dict()
+    """
+
+    def __init__(self, *, n_bins: int = 10, move_bucket_size: int = 10, rating_band_size: int = 200) -> None:
+        if n_bins <= 0 or move_bucket_size <= 0 or rating_band_size <= 0:
+            raise ValueError("n_bins, move_bucket_size and rating_band_size must be positive")
+        self.n_bins = n_bins
+        self.move_bucket_size = move_bucket_size
+        self.rating_band_size = rating_band_size
+        self.totals = np.zeros(5)
+        self.outcome_sq = 0.0
+        self.bins = np.zeros((n_bins, 3))  # rows, predictions, outcomes
+        self.by_move_bucket: dict[int, np.ndarray] = {}
+        self.by_rating_band: dict[str, np.ndarray] = {}
+
+    def update(
+        self,
+        predicted: np.ndarray,
+        outcome: np.ndarray,
+        *,
+        move_number: np.ndarray | None = None,
+        rating: np.ndarray | None = None,
+    ) -> None:
+        """
+        Fold one chunk of predictions into the running sums.
+
+        Args:
+            predicted: Predicted expected score in [0, 1].
+            outcome: Actual score (1, 0.5 or 0).
+            move_number: Optional move numbers, for the per-move-bucket breakdown.
+            rating: Optional lower rating of the two players (partitions.rating_floor; NaN if
+                unknown), for the per-rating-band breakdown.
+        """
+        predicted = np.asarray(predicted, dtype=np.float64)
+        outcome = np.asarray(outcome, dtype=np.float64)
+        clipped = np.clip(predicted, _EPS, 1 - _EPS)
+        values = np.column_stack(
+            [
+                np.ones_like(predicted),
+                predicted,
+                outcome,
+                (predicted - outcome) ** 2,
+                -(outcome * np.log(clipped) + (1 - outcome) * np.log(1 - clipped)),
+            ]
+        )
+        self.totals += values.sum(axis=0)
+        self.outcome_sq += float(np.dot(outcome, outcome))
+
+        bins = np.minimum((predicted * self.n_bins).astype(np.int64), self.n_bins - 1)
+        for column in range(3):
+            self.bins[:, column] += np.bincount(bins, weights=values[:, column], minlength=self.n_bins)
+
+        # Same bucket/band rules as the partitioned dataset layout.
+        if move_number is not None:
+            buckets = partitions.move_buckets(pd.Series(move_number), self.move_bucket_size)
+            self._add_groups(self.by_move_bucket, [int(bucket) for bucket in buckets], values)
+        if rating is not None:
+            ratings = pd.Series(np.asarray(rating, dtype=np.float64))
+            bands = partitions.rating_bands(ratings, self.rating_band_size, ratings.index)
+            self._add_groups(self.by_rating_band, bands.tolist(), values)
+
+    @staticmethod
+    def _add_groups(groups: dict[Any, np.ndarray], keys: list[Any], values: np.ndarray) -> None:
+        # Group by position in keys, not by label: a list of small ints would also read as columns.
+        unique, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        sums = np.zeros((len(unique), values.shape[1]))
+        np.add.at(sums, inverse.ravel(), values)
+        for key, row in zip(unique.tolist(), sums):
+            groups[key] = groups.get(key, np.zeros(5)) + row
+
+    def to_dict(self) -> dict[str, Any]:
+        overall: dict[str, Any] = _scores(self.totals)
+        n = self.totals[_N]
+        if n > 0:
+            total_var = self.outcome_sq - self.totals[_OUTCOME] ** 2 / n
+            overall["r2"] = 1 - self.totals[_SQ_ERR] / total_var if total_var > 0 else None
+
+        reliability = []
+        for index, (rows, pred_sum, outcome_sum) in enumerate(self.bins):
+            reliability.append(
+                {
+                    "bin_low": index / self.n_bins,
+                    "bin_high": (index + 1) / self.n_bins,
+                    "rows": int(rows),
+                    "mean_prediction": pred_sum / rows if rows else None,
+                    "mean_outcome": outcome_sum / rows if rows else None,
+                }
+            )
+
+        return {
+            "overall": overall,
+            "reliability": reliability,
+            "move_bucket_size": self.move_bucket_size,
+            "by_move_bucket": {
+                str(key): _scores(self.by_move_bucket[key]) for key in sorted(self.by_move_bucket)
+            },
+            "rating_band_size": self.rating_band_size,
+            "by_rating_band": {
+                key: _scores(self.by_rating_band[key])
+                for key in sorted(self.by_rating_band, key=lambda band: (band == NO_RATING, band.zfill(6)))
+            },
+        }
+
+
+def evaluate_model(
+    model_path: str | pathlib.Path,
+    input_path: str | pathlib.Path,
+    *,
+    chunk_rows: int = 50_000,
+    workers: int = 1,
+    n_bins: int = 10,
+    move_bucket_size: int = 10,
+    rating_band_size: int = 200,
+    quarantine: list[dict] | None = None,
+    progress: bool = True,
+) -> CalibrationReport:
+    """
+    Stream a held-out positions file through a saved model into a CalibrationReport.
+
+    Args:
+        model_path: Model saved by v1_regression_model.save_model.
+        input_path: Positions CSV/Parquet file or sharded/partitioned dataset directory; needs
+            fen/side_to_move/result (or the feature columns plus regression_score).
+        chunk_rows: Positions per chunk; bounds memory use.
+        workers: Processes computing features per chunk.
+        n_bins / move_bucket_size / rating_band_size: Report granularity.
+        quarantine: If given, rows with an invalid FEN are recorded here instead of raising.
+        progress: Print rows evaluated and throughput after every chunk.
+    """
+    model, feature_cols = load_model(model_path)
+    report = CalibrationReport(
+        n_bins=n_bins, move_bucket_size=move_bucket_size, rating_band_size=rating_band_size
+    )
+    columns = KEY_COLS + ["fen", "result", TARGET_COL, "white_rating", "black_rating"] + list(feature_cols)
+
+    started = time.perf_counter()
+    for chunk in iter_position_chunks(input_path, chunk_rows=chunk_rows, columns=columns):
+        rows = featurize_chunk(chunk, feature_cols, quarantine=quarantine, workers=workers)
+        if TARGET_COL not in rows.columns:
+            raise ValueError(f"Input needs fen/side_to_move/result or a '{TARGET_COL}' column")
+        rows = rows.dropna(subset=[TARGET_COL])
+        rating = partitions.rating_floor(rows)
+        report.update(
+            predict_rows(model, rows, feature_cols),
+            rows[TARGET_COL].to_numpy(),
+            move_number=rows["move_number"].to_numpy() if "move_number" in rows.columns else None,
+            rating=rating.to_numpy() if rating is not None else None,
+        )
+        if progress:
+            elapsed = time.perf_counter() - started
+            n = int(report.totals[_N])
+            print(f"Evaluated {n} rows ({n / elapsed:,.0f} rows/s).", flush=True)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calibration report of a model on held-out positions.")
+    parser.add_argument(
+        "--model",
+        required=True,
+        help="Model file saved with v1_regression_model --model-out.",
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        help="Held-out positions CSV/Parquet file, or sharded/partitioned dataset directory.",
+    )
+    parser.add_argument("--output", required=True, help="Output report path (JSON).")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Positions evaluated per chunk.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for feature computation.")
+    parser.add_argument("--bins", type=int, default=10, help="Reliability curve bins.")
+    parser.add_argument("--move-bucket-size", type=int, default=10, help="Moves per breakdown bucket.")
+    parser.add_argument("--rating-band-size", type=int, default=200, help="Rating points per breakdown band.")
+    args = parser.parse_args()
+
+    quarantine: list[dict] = []
+    report = evaluate_model(
+        args.model,
+        args.input,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        n_bins=args.bins,
+        move_bucket_size=args.move_bucket_size,
+        rating_band_size=args.rating_band_size,
+        quarantine=quarantine,
+    ).to_dict()
+    report["quarantined"] = len(quarantine)
+
+    output = pathlib.Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+
+    overall = report["overall"]
+    if overall["rows"]:
+        print(f"Brier: {overall['brier']:.4f}  log loss: {overall['log_loss']:.4f}  R^2: {overall['r2']}")
+    print(f"Wrote calibration report for {overall['rows']} positions to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Append-only typed column buffers for building large position/feature tables.
+
+Loaders append one row at a time into array-module buffers instead of creating a dict per row:
+integers and floats are stored unboxed, and repeated strings (result, side_to_move, SAN, ...) are
+stored as int32 codes into a per-column table of distinct values, becoming pandas categoricals.
+to_frame builds the DataFrame straight from the buffers without per-row inference.
+"""
+
+from array import array
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Column kinds accepted in a schema.
+INT = "int"
+FLOAT = "float"
+CATEGORY = "category"
+STR = "str"
+
+
+class _CategoryColumn:
+    """Int32 codes plus the distinct values they index; None/NaN become missing (-1)."""
+
+    __slots__ = ("codes", "values", "_lookup")
+
+    def __init__(self) -> None:
+        self.codes = array("i")
+        self.values: list[Any] = []
+        self._lookup: dict[Any, int] = {}
+
+    def append(self, value: Any) -> None:
+        code = self._lookup.get(value)
+        if code is None:
+            if value is None or value != value:
+                self.codes.append(-1)
+                return
+            code = len(self.values)
+            self._lookup[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __delitem__(self, key: slice) -> None:
+        del self.codes[key]
+
+    def to_series(self, name: str) -> pd.Series:
+        codes = _as_numpy(self.codes, np.int32)
+        categories = pd.Index(self.values, dtype=object)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories), name=name)
+
+
+def _as_numpy(buffer: array, dtype: type) -> np.ndarray:
+    """View an array-module buffer as NumPy (no copy); empty buffers cannot be viewed."""
+    if not len(buffer):
+        return np.empty(0, dtype=dtype)
+    return np.frombuffer(buffer, dtype=dtype)
+
+
+class ColumnBuilder:
+    """
+    Row-wise builder for a fixed schema of typed columns.
+
+    Example:
+        cols = ColumnBuilder([("ply", INT), ("fen", STR), ("result", CATEGORY)])
+        cols.append(1, "rnbqkbnr/...", "1-0")
+        df = cols.to_frame()
+    """
+
+    __slots__ = ("names", "kinds", "_columns", "_appenders")
+
+    def __init__(self, schema: Sequence[tuple[str, str]]) -> None:
+        self.names = [name for name, _ in schema]
+        self.kinds = [kind for _, kind in schema]
+        self._columns: list[Any] = []
+        for name, kind in schema:
+            if kind == INT:
+                column: Any = array("q")
+            elif kind == FLOAT:
+                column = array("d")
+            elif kind == CATEGORY:
+                column = _CategoryColumn()
+            elif kind == STR:
+                column = []
+            else:
+                raise ValueError(f"Unknown column kind '{kind}' for column '{name}'")
+            self._columns.append(column)
+        self._appenders = [column.append for column in self._columns]
+
+    def append(self, *values: Any) -> None:
+        """Append one row; values are given in schema order."""
+        for append, value in zip(self._appenders, values):
+            append(value)
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def truncate(self, length: int) -> None:
+        """Drop every row from position `length` on (used to discard a partially replayed game)."""
+        for column in self._columns:
+            del column[length:]
+
+    def buffers(self) -> list[tuple[str, str, Any, list[Any] | None]]:
+        """(name, kind, raw buffer, distinct values or None) per column; categories buffer their codes."""
+        out: list[tuple[str, str, Any, list[Any] | None]] = []
+        for name, kind, column in zip(self.names, self.kinds, self._columns):
+            if kind == CATEGORY:
+                out.append((name, kind, column.codes, column.values))
+            else:
+                out.append((name, kind, column, None))
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build the DataFrame; the builder must not be appended to afterwards."""
+        data: dict[str, Any] = {}
+        for name, kind, column in zip(self.names, self.kinds, self._columns):
+            if kind == INT:
+                data[name] = _as_numpy(column, np.int64)
+            elif kind == FLOAT:
+                data[name] = _as_numpy(column, np.float64)
+            elif kind == CATEGORY:
+                data[name] = column.to_series(name)
+            else:
+                data[name] = pd.Series(column, dtype=object, name=name)
+        return pd.DataFrame(data)
@@ -0,0 +1,197 @@
+"""
+Read compressed game archives (.gz, .bz2, .xz, .zst) as text streams without unpacking them first.
+
+open_text picks the codec from the file extension. Decompression runs in a background thread
+that keeps a few chunks of decompressed bytes ready in a bounded queue, so it overlaps with
+whatever consumes the stream (PGN parsing and game replay, CSV parsing); the codecs release the
+GIL while decompressing. Plain files are opened as usual.
+
+.zst needs the optional zstandard package.
+
+Compressed streams cannot seek: callers that record or jump to offsets (resume by byte offset,
+splitting a PGN into blocks for worker processes) must check is_compressed first. CSV blocks
+(csv_blocks / read_csv_block) are the exception: their offsets count decompressed bytes, and a
+compressed block is reached by decompressing and discarding the bytes before it, without
+parsing them.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import pathlib
+import queue
+import threading
+from typing import IO, Any
+
+import pandas as pd
+
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+CHUNK_SIZE = 1 << 20
+QUEUE_CHUNKS = 8
+
+
+def is_compressed(path: str | pathlib.Path) -> bool:
+    return pathlib.Path(path).suffix.lower() in COMPRESSED_SUFFIXES
+
+
+def _open_binary(path: pathlib.Path) -> IO[bytes]:
+    suffix = path.suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(path, "rb")
+    if suffix == ".bz2":
+        return bz2.open(path, "rb")
+    if suffix == ".xz":
+        return lzma.open(path, "rb")
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise ImportError("Reading .zst files requires the zstandard package") from exc
+        return zstandard.ZstdDecompressor().stream_reader(path.open("rb"), closefd=True)
+    return path.open("rb")
+
+
+class _ThreadedReader(io.RawIOBase):
+    """Raw binary stream whose source is read (decompressed) ahead by a background thread."""
+
+    def __init__(self, source: IO[bytes], chunk_size: int = CHUNK_SIZE, depth: int = QUEUE_CHUNKS) -> None:
+        super().__init__()
+        self._source = source
+        self._chunk_size = chunk_size
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._pump, name="decompress", daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _pump(self) -> None:
+        try:
+            while not self._stop.is_set():
+                chunk = self._source.read(self._chunk_size)
+                if not chunk:
+                    break
+                if not self._put(chunk):
+                    return
+        except BaseException as exc:  # re-raised in the reading thread
+            self._put(exc)
+            return
+        self._put(None)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if not self._pending:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._pending = memoryview(item)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+
+def csv_blocks(
+    path: str | pathlib.Path,
+    rows_per_block: int,
+    max_rows: int | None = None,
+) -> list[tuple[int, int, int]]:
+    """
+    Split a CSV file into (offset, first_row, n_rows) blocks of up to rows_per_block data rows.
+
+    offset is the byte offset of the block's first row in the (decompressed) file. Rows end at
+    line ends outside double quotes, so quoted fields may span lines (as club PGNs do); blank
+    lines between rows are skipped, as pandas does.
+    """
+    if rows_per_block <= 0:
+        raise ValueError("rows_per_block must be positive")
+    blocks: list[list[int]] = []
+    n_rows = 0
+    with _open_binary(pathlib.Path(path)) as handle:
+        position = len(handle.readline())  # header
+        row_start = None
+        quotes = 0
+        for line in handle:
+            if row_start is None:
+                if max_rows is not None and n_rows >= max_rows:
+                    break
+                if not line.strip():
+                    position += len(line)
+                    continue
+                row_start = position
+            position += len(line)
+            quotes += line.count(b'"')
+            if quotes % 2:
+                continue
+            if n_rows % rows_per_block == 0:
+                blocks.append([row_start, n_rows, 0])
+            blocks[-1][2] += 1
+            n_rows += 1
+            row_start = None
+            quotes = 0
+    return [(offset, first_row, count) for offset, first_row, count in blocks]
+
+
+def read_csv_block(
+    path: str | pathlib.Path,
+    offset: int,
+    n_rows: int,
+    **read_csv_options: Any,
+) -> pd.DataFrame:
+    """Read n_rows data rows starting at a csv_blocks offset, with the file's header as column names."""
+    path = pathlib.Path(path)
+    with open_text(path) as handle:
+        names = list(pd.read_csv(handle, nrows=0).columns)
+    with _open_binary(path) as handle:
+        if is_compressed(path):
+            remaining = offset
+            while remaining > 0:
+                chunk = handle.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        else:
+            handle.seek(offset)
+        return pd.read_csv(handle, header=None, names=names, nrows=n_rows, **read_csv_options)
+
+
+def open_text(path: str | pathlib.Path, *, threaded: bool = True) -> io.TextIOWrapper:
+    """
+    Open a plain or compressed file as UTF-8 text.
+
+    Args:
+        path: File path; .gz/.bz2/.xz/.zst files are decompressed on the fly.
+        threaded: Decompress in a background thread (ignored for plain files).
+    """
+    path = pathlib.Path(path)
+    if not is_compressed(path):
+        return path.open("r", encoding="utf-8")
+    source = _open_binary(path)
+    if not threaded:
+        return io.TextIOWrapper(source, encoding="utf-8")
+    return io.TextIOWrapper(io.BufferedReader(_ThreadedReader(source), CHUNK_SIZE), encoding="utf-8")
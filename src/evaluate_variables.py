@@ -1,7 +1,39 @@
+"""
+Compute position features for a positions CSV (e.g. the output of make_dataset).
+
+Usage:
+    PYTHONPATH=. python src/evaluate_variables.py --input data/club_positions.csv --output data/club_positions_features.csv
+    PYTHONPATH=. python src/evaluate_variables.py --input data/club_positions.csv --output data/features --rows-per-shard 50000 --resume
+    PYTHONPATH=. python src/evaluate_variables.py --input data/club_positions.csv --output data/centrality.csv --features centrality
+"""
+
+import argparse
+import functools
+import pathlib
+from typing import Any, Sequence
+
 import chess
 import pandas as pd
 
-from src import features
+from src import compressed, features, transport
+from src.columns import CATEGORY, FLOAT, INT, ColumnBuilder
+from src.shards import ShardManifest, write_frame, write_quarantine
+
+_COLUMN_KINDS = {"int": INT, "float": FLOAT}
+# Input rows per work unit when features are computed in worker processes.
+_ROWS_PER_UNIT = 5_000
+
+
+def features_schema(feature_names: Sequence[str] | None = None) -> list[tuple[str, str]]:
+    """Output columns of evaluate_positions_with_side for the requested features (None: defaults)."""
+    if feature_names is None:
+        feature_names = features.DEFAULT_FEATURES
+    feature_columns = [(name, _COLUMN_KINDS[kind]) for name, kind in features.feature_kinds(feature_names)]
+    return (
+        [("index", INT), ("side_to_move", CATEGORY)]
+        + feature_columns
+        + [("result", CATEGORY), ("winning_side", CATEGORY), ("regression_score", FLOAT)]
+    )
 
 
 def _result_to_winner(result: str | None) -> str:
@@ -18,22 +50,107 @@ def _result_to_winner(result: str | None) -> str:
     return "unknown"
 
 
-def features_from_fen(fen: str) -> dict[str, int | str]:
+def features_from_fen(fen: str, feature_names: Sequence[str] | None = None) -> dict[str, int | str]:
     """
     Compute feature metrics for the side to move in a given FEN string.
 
-    Returns: side_to_move, connection, mobility, centrality.
+    Returns: side_to_move and the requested features (default: connection, mobility, centrality).
     """
     board = chess.Board(fen)
     side = "white" if board.turn == chess.WHITE else "black"
 
-    vals = features.position_features(board, board.turn)
-    return {
-        "side_to_move": side,
-        "connection": vals["connection"],
-        "mobility": vals["mobility"],
-        "centrality": vals["centrality"],
+    return {"side_to_move": side, **features.compute_features(board, board.turn, feature_names)}
+
+
+def _evaluate_rows(
+    df: pd.DataFrame,
+    *,
+    side_col: str,
+    fen_col: str,
+    result_col: str,
+    quarantine: list[dict] | None,
+    feature_names: Sequence[str] | None = None,
+) -> ColumnBuilder:
+    """Compute a features_schema(feature_names) row for each usable row of a positions DataFrame."""
+    columns = ColumnBuilder(features_schema(feature_names))
+    missing = pd.Series(None, index=df.index, dtype=object)
+    rows = zip(df.index, df.get(fen_col, missing), df.get(side_col, missing), df.get(result_col, missing))
+    for idx, fen, side_raw, result in rows:
+        if not isinstance(fen, str) or not fen.strip() or not isinstance(side_raw, str):
+            continue
+
+        side_normalized = side_raw.lower()
+        if side_normalized not in ("white", "black"):
+            continue
+        color = chess.WHITE if side_normalized == "white" else chess.BLACK
+
+        try:
+            board = chess.Board(fen)
+        except ValueError as exc:
+            if quarantine is None:
+                raise
+            quarantine.append({"index": idx, "fen": fen, "error": str(exc)})
+            continue
+        vals = features.compute_features(board, color, feature_names)
+
+        winning_side = _result_to_winner(result)
+        if winning_side == "draw":
+            regression_score = 0.5
+        elif winning_side == side_normalized:
+            regression_score = 1.0
+        else:
+            regression_score = 0.0
+
+        columns.append(idx, side_normalized, *vals.values(), result, winning_side, regression_score)
+    return columns
+
+
+def _evaluate_unit(df: pd.DataFrame, **options: Any) -> tuple[ColumnBuilder, list[dict]]:
+    """Worker side of evaluate_frame: always quarantines, the parent decides whether to raise."""
+    quarantined: list[dict] = []
+    return _evaluate_rows(df, quarantine=quarantined, **options), quarantined
+
+
+def evaluate_frame(
+    df: pd.DataFrame,
+    *,
+    side_col: str = "side_to_move",
+    fen_col: str = "fen",
+    result_col: str = "result",
+    quarantine: list[dict] | None = None,
+    feature_names: Sequence[str] | None = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Compute features for the rows of an in-memory positions DataFrame.
+
+    Output is as for evaluate_positions_with_side; its index column holds the input row labels.
+    With workers > 1 the rows are evaluated in blocks of _ROWS_PER_UNIT and the results are
+    returned through shared buffers (src/transport.py) instead of being pickled.
+    """
+    options = {
+        "side_col": side_col,
+        "fen_col": fen_col,
+        "result_col": result_col,
+        "feature_names": feature_names,
     }
+    if workers <= 1 or len(df) <= _ROWS_PER_UNIT:
+        return _evaluate_rows(df, quarantine=quarantine, **options).to_frame()
+
+    # Send workers only the columns they read.
+    df = df[[col for col in (fen_col, side_col, result_col) if col in df.columns]]
+    units = [df.iloc[start : start + _ROWS_PER_UNIT] for start in range(0, len(df), _ROWS_PER_UNIT)]
+    frame, quarantined = transport.run_columnar(
+        functools.partial(_evaluate_unit, **options),
+        units,
+        features_schema(feature_names),
+        workers=workers,
+    )
+    if quarantined and quarantine is None:
+        raise ValueError(f"Invalid FEN at row {quarantined[0]['index']}: {quarantined[0]['error']}")
+    if quarantine is not None:
+        quarantine.extend(quarantined)
+    return frame
 
 
 def evaluate_positions_with_side(
@@ -43,52 +160,213 @@ def evaluate_positions_with_side(
     fen_col: str = "fen",
     result_col: str = "result",
     max_rows: int | None = None,
+    quarantine: list[dict] | None = None,
+    features: Sequence[str] | None = None,
+    workers: int = 1,
 ) -> pd.DataFrame:
     """
     Load a CSV with side_to_move, FEN, and result columns and compute features for each row.
 
-    Returns a DataFrame with: index, side_to_move, connection, mobility, centrality, result, winning_side.
+    Rows with an invalid FEN are recorded in quarantine (if given) instead of raising. Only the
+    requested features (names from features.FEATURES) are computed, e.g. features=["centrality"].
+    With workers > 1, rows are evaluated in that many processes (see evaluate_frame).
+
+    Returns a DataFrame with: index, side_to_move, <features> (default: connection, mobility,
+    centrality), result, winning_side, regression_score.
     """
     df = pd.read_csv(csv_path)
     if max_rows is not None:
         df = df.head(max_rows)
 
-    records: list[dict] = []
-    for idx, row in df.iterrows():
-        fen = row.get(fen_col)
-        side_raw = row.get(side_col)
-        result = row.get(result_col)
+    return evaluate_frame(
+        df,
+        side_col=side_col,
+        fen_col=fen_col,
+        result_col=result_col,
+        quarantine=quarantine,
+        feature_names=features,
+        workers=workers,
+    )
 
-        if not isinstance(fen, str) or not fen.strip() or not isinstance(side_raw, str):
-            continue
 
-        side_normalized = side_raw.lower()
-        if side_normalized not in ("white", "black"):
-            continue
-        color = chess.WHITE if side_normalized == "white" else chess.BLACK
+def evaluate_positions_to_shards(
+    csv_path: str | pathlib.Path,
+    output_dir: str | pathlib.Path,
+    *,
+    rows_per_shard: int = 50_000,
+    fmt: str = "csv",
+    resume: bool = False,
+    side_col: str = "side_to_move",
+    fen_col: str = "fen",
+    result_col: str = "result",
+    max_rows: int | None = None,
+    features: Sequence[str] | None = None,
+    workers: int = 1,
+) -> ShardManifest:
+    """
+    Compute features for a positions CSV into a directory of shards, one per block of input rows.
 
-        board = chess.Board(fen)
-        vals = features.position_features(board, color)
+    Finished shards (and their input row ranges) are recorded in output_dir/manifest.json; with
+    resume=True they are skipped without computing features. Rows with an invalid FEN are written
+    to output_dir/quarantine.jsonl and never abort the run. With workers > 1, each shard is
+    evaluated in that many processes.
 
-        winning_side = _result_to_winner(result)
-        if winning_side == "draw":
-            regression_score = 0.5
-        elif winning_side == side_normalized:
-            regression_score = 1.0
-        else:
-            regression_score = 0.0
+    Returns:
+        The completed ShardManifest.
+    """
+    if rows_per_shard <= 0:
+        raise ValueError("rows_per_shard must be positive")
 
-        records.append(
-            {
-                "index": idx,
-                "side_to_move": side_normalized,
-                "connection": vals["connection"],
-                "mobility": vals["mobility"],
-                "centrality": vals["centrality"],
-                "result": result,
-                "winning_side": winning_side,
-                "regression_score": regression_score,
-            }
+    settings = {
+        "input": str(csv_path),
+        "rows_per_shard": rows_per_shard,
+        "format": fmt,
+        "side_col": side_col,
+        "fen_col": fen_col,
+        "result_col": result_col,
+        "max_rows": max_rows,
+        "features": list(features) if features is not None else None,
+    }
+    manifest = ShardManifest.open(output_dir, settings, resume=resume)
+    if manifest.complete:
+        return manifest
+
+    with pd.read_csv(csv_path, chunksize=rows_per_shard, nrows=max_rows) as chunks:
+        for shard_id, chunk in enumerate(chunks):
+            if manifest.is_done(shard_id):
+                continue
+            quarantined: list[dict] = []
+            shard = evaluate_frame(
+                chunk,
+                side_col=side_col,
+                fen_col=fen_col,
+                result_col=result_col,
+                quarantine=quarantined,
+                feature_names=features,
+                workers=workers,
+            )
+            manifest.commit(
+                shard_id,
+                shard,
+                fmt,
+                quarantined=quarantined,
+                first_row=int(chunk.index[0]),
+                last_row=int(chunk.index[-1]),
+            )
+
+    manifest.finish()
+    return manifest
+
+
+def plan_queue_units(
+    csv_path: str | pathlib.Path,
+    *,
+    rows_per_unit: int = 50_000,
+    max_rows: int | None = None,
+) -> list[dict[str, Any]]:
+    """Split a positions CSV into work units at row byte offsets (see src/workqueue.py)."""
+    if rows_per_unit <= 0:
+        raise ValueError("rows_per_unit must be positive")
+    return [
+        {"offset": offset, "first_row": first_row, "n_rows": n_rows}
+        for offset, first_row, n_rows in compressed.csv_blocks(csv_path, rows_per_unit, max_rows)
+    ]
+
+
+def process_queue_unit(unit: dict[str, Any], settings: dict[str, Any]) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    Compute features for one work unit (a block of rows); returns the rows and quarantined inputs.
+
+    settings holds input, side_col, fen_col, result_col and features.
+    """
+    first_row = unit["first_row"]
+    # The columns read as text, as in a whole-file read, whatever one unit's values look like.
+    text_cols = {settings[name]: str for name in ("side_col", "fen_col", "result_col")}
+    df = compressed.read_csv_block(settings["input"], unit["offset"], unit["n_rows"], dtype=text_cols)
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    quarantined: list[dict] = []
+    frame = evaluate_frame(
+        df,
+        side_col=settings["side_col"],
+        fen_col=settings["fen_col"],
+        result_col=settings["result_col"],
+        quarantine=quarantined,
+        feature_names=settings["features"],
+    )
+    return frame, quarantined
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compute position features for a positions CSV.")
+    parser.add_argument("--input", required=True, help="Positions CSV with side_to_move, fen and result columns.")
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="Output CSV path, or output directory with --rows-per-shard.",
+    )
+    parser.add_argument("--max-rows", type=int, default=None, help="Optional limit on rows to evaluate.")
+    parser.add_argument(
+        "--rows-per-shard",
+        type=int,
+        default=None,
+        help="Write a sharded, resumable run with this many input rows per shard (output is a directory).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Shard format for sharded runs.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted sharded run, skipping shards already finished.",
+    )
+    parser.add_argument(
+        "--features",
+        default=None,
+        help="Comma-separated feature names to compute (default: connection,mobility,centrality).",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for feature computation.")
+    args = parser.parse_args()
+
+    feature_names = args.features.split(",") if args.features else None
+    if args.resume and args.rows_per_shard is None:
+        parser.error("--resume requires --rows-per-shard")
+
+    if args.rows_per_shard is not None:
+        manifest = evaluate_positions_to_shards(
+            args.input,
+            args.output,
+            rows_per_shard=args.rows_per_shard,
+            fmt=args.format,
+            resume=args.resume,
+            max_rows=args.max_rows,
+            features=feature_names,
+            workers=args.workers,
+        )
+        print(
+            f"Wrote {manifest.rows} feature rows in {len(manifest.shards)} shards to {args.output} "
+            f"({manifest.quarantined} rows quarantined)."
         )
+        return
+
+    quarantine: list[dict] = []
+    df = evaluate_positions_with_side(
+        args.input,
+        max_rows=args.max_rows,
+        quarantine=quarantine,
+        features=feature_names,
+        workers=args.workers,
+    )
+    write_frame(df, args.output, "csv")
+    print(f"Wrote {len(df)} feature rows to {args.output}.")
+
+    if quarantine:
+        quarantine_path = f"{args.output}.quarantine.jsonl"
+        write_quarantine(quarantine, quarantine_path)
+        print(f"Quarantined {len(quarantine)} invalid rows to {quarantine_path}.")
+
 
-    return pd.DataFrame(records)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Static exchange evaluation (SEE) on a shared per-position attack map.
+
+AttackMap computes every piece's attack bitboard once and inverts it into attackers-per-square,
+so any number of squares can be evaluated without recomputing attacks. Like move_utils.hanging,
+attackers are pseudo-legal (pinned pieces still count).
+"""
+
+import chess
+
+PIECE_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+    chess.KING: 100,
+}
+
+_CAPTURE_ORDER = (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING)
+
+
+class AttackMap:
+    """
+    Attack bitboards for every piece of a position, shared by all square queries.
+
+    Attributes:
+        attackers_to: attackers_to[color][square] is the bitboard of `color` pieces attacking square.
+        attacked: attacked[color] is the union of squares attacked by `color`.
+    """
+
+    __slots__ = ("board", "attackers_to", "attacked", "_see")
+
+    def __init__(self, board: chess.Board) -> None:
+        self.board = board
+        self.attackers_to = ([0] * 64, [0] * 64)
+        self.attacked = [0, 0]
+        self._see: dict[chess.Square, int] = {}
+
+        for color in chess.COLORS:
+            attackers_to = self.attackers_to[color]
+            for sq in chess.scan_forward(board.occupied_co[color]):
+                attacks = board.attacks_mask(sq)
+                self.attacked[color] |= attacks
+                bb_sq = chess.BB_SQUARES[sq]
+                for target in chess.scan_forward(attacks):
+                    attackers_to[target] |= bb_sq
+
+    def attackers(self, color: chess.Color, square: chess.Square) -> int:
+        return self.attackers_to[color][square]
+
+    def is_hanging(self, square: chess.Square) -> bool:
+        """True if the piece on square is attacked and undefended (same rule as move_utils.hanging)."""
+        color = bool(self.board.occupied_co[chess.WHITE] & chess.BB_SQUARES[square])
+        return bool(self.attackers_to[not color][square]) and not self.attackers_to[color][square]
+
+    def static_exchange(self, square: chess.Square) -> int:
+        """
+        Material won by the opponent of the piece on square if they start capturing there.
+
+        Both sides recapture with their least valuable attacker and may stop whenever continuing
+        would lose material; sliders uncovered behind a capturing piece (x-rays) join in. The
+        result is negative when the first capture loses material, 0 if the square is not attacked.
+        Results are cached per square.
+        """
+        cached = self._see.get(square)
+        if cached is not None:
+            return cached
+
+        board = self.board
+        target_type = board.piece_type_at(square)
+        if target_type is None:
+            raise ValueError(f"No piece on square '{chess.square_name(square)}'")
+
+        side = not bool(board.occupied_co[chess.WHITE] & chess.BB_SQUARES[square])
+        occupied = board.occupied
+        attackers = self.attackers_to[chess.WHITE][square] | self.attackers_to[chess.BLACK][square]
+
+        from_sq = self._least_valuable(side, attackers)
+        gains: list[int] = []
+        if from_sq is not None:
+            gains.append(PIECE_VALUES[target_type])
+        while from_sq is not None:
+            on_square = PIECE_VALUES[board.piece_type_at(from_sq)]
+            occupied &= ~chess.BB_SQUARES[from_sq]
+            attackers = (attackers | self._slider_attackers(square, occupied)) & occupied
+            side = not side
+            from_sq = self._least_valuable(side, attackers)
+            if from_sq is None:
+                break
+            gains.append(on_square - gains[-1])
+
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+
+        value = gains[0] if gains else 0
+        self._see[square] = value
+        return value
+
+    def _least_valuable(self, color: chess.Color, attackers: int) -> chess.Square | None:
+        board = self.board
+        own = attackers & board.occupied_co[color]
+        if not own:
+            return None
+        for piece_type in _CAPTURE_ORDER:
+            candidates = own & board.pieces_mask(piece_type, color)
+            if candidates:
+                return chess.lsb(candidates)
+        return None
+
+    def _slider_attackers(self, square: chess.Square, occupied: int) -> int:
+        board = self.board
+        diagonal = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+        straight = (
+            chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+            | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+        )
+        return (diagonal & (board.bishops | board.queens)) | (straight & (board.rooks | board.queens))
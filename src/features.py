@@ -1,6 +1,12 @@
+from typing import Any, Callable, Iterable
+
 import chess
 
-from src import move_utils, protection
+from src import protection, squares
+from src.exchange import AttackMap
+
+# Legal moves of the side to move, grouped by origin square.
+LegalMoveTable = dict[chess.Square, list[chess.Move]]
 
 
 def _normalize_color(color: chess.Color | str) -> chess.Color:
@@ -23,17 +29,40 @@ def position_connection(board: chess.Board, color: chess.Color | str) -> int:
     Legal defenders only.
     """
     color = _normalize_color(color)
+    return _connection(board, color, _side_pieces(board, color))
 
-    total_defenders = 0
-    for sq, piece in board.piece_map().items():
-        if piece.color != color:
-            continue
-        defenders = protection.square_defenders(board, chess.square_name(sq), include_san=False)
-        total_defenders += len(defenders)
 
+def _side_pieces(board: chess.Board, color: chess.Color) -> list[tuple[chess.Square, chess.Piece]]:
+    return [(sq, piece) for sq, piece in board.piece_map().items() if piece.color == color]
+
+
+def _legal_move_table(board: chess.Board) -> LegalMoveTable:
+    table: LegalMoveTable = {}
+    for move in board.legal_moves:
+        table.setdefault(move.from_square, []).append(move)
+    return table
+
+
+def _connection(
+    board: chess.Board,
+    color: chess.Color,
+    pieces: list[tuple[chess.Square, chess.Piece]],
+) -> int:
+    total_defenders = 0
+    for sq, _ in pieces:
+        total_defenders += len(protection.defender_squares(board, sq))
     return total_defenders
 
 
+_MOBILITY_WEIGHTS = {
+    chess.KING: 0.5,
+    chess.BISHOP: 1.5,
+    chess.KNIGHT: 1.5,
+    chess.ROOK: 1.5,
+    chess.QUEEN: 2.0,
+}
+
+
 #does not yet account for hanging, positive trade and negative trades for potential moves
 def position_mobility(board: chess.Board, color: chess.Color | str) -> float:
     """
@@ -44,42 +73,196 @@ def position_mobility(board: chess.Board, color: chess.Color | str) -> float:
         color: chess.WHITE/chess.BLACK or "white"/"black".
     """
     color = _normalize_color(color)
-    weights = {
-        chess.KING: 0.5,
-        chess.BISHOP: 1.5,
-        chess.KNIGHT: 1.5,
-        chess.ROOK: 1.5,
-        chess.QUEEN: 2.0,
-    }
+    return _mobility(board, color, _side_pieces(board, color), _legal_move_table(board))
 
-    total_moves = 0.0
-    for sq, piece in board.piece_map().items():
-        if piece.color != color:
-            continue
-        move_count = move_utils.piece_moves(board, chess.square_name(sq))
-        total_moves += move_count * weights.get(piece.piece_type, 1.0)
 
+def _mobility(
+    board: chess.Board,
+    color: chess.Color,
+    pieces: list[tuple[chess.Square, chess.Piece]],
+    legal_moves: LegalMoveTable,
+) -> float:
+    total_moves = 0.0
+    for sq, piece in pieces:
+        move_count = len(legal_moves.get(sq, ()))
+        total_moves += move_count * _MOBILITY_WEIGHTS.get(piece.piece_type, 1.0)
     return total_moves
 
 
-_CENTER_CORE = {chess.D4, chess.E4, chess.D5, chess.E5}
-_CENTER_RING = {
-    chess.C4,
-    chess.F4,
-    chess.C5,
-    chess.F5,
-    chess.D3,
-    chess.E3,
-    chess.D6,
-    chess.E6,
-}
-_CENTER_CORNERS = {
-    chess.C3,
-    chess.F3,
-    chess.C6,
-    chess.F6,
-}
-_CENTRAL_SQUARES = _CENTER_CORE | _CENTER_RING | _CENTER_CORNERS
+def _attacks(piece_type: chess.PieceType, color: chess.Color, square: chess.Square, occupied: int) -> int:
+    """Attack bitboard of a piece on `square` for the given occupancy (precomputed tables)."""
+    if piece_type == chess.PAWN:
+        return squares.PAWN_ATTACKS[color][square]
+    if piece_type == chess.KNIGHT:
+        return squares.KNIGHT_ATTACKS[square]
+    if piece_type == chess.KING:
+        return squares.KING_ATTACKS[square]
+
+    attacks = 0
+    if piece_type in (chess.BISHOP, chess.QUEEN):
+        attacks = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    if piece_type in (chess.ROOK, chess.QUEEN):
+        attacks |= (
+            chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+            | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+        )
+    return attacks
+
+
+def _step_targets(
+    piece_type: chess.PieceType,
+    color: chess.Color,
+    square: chess.Square,
+    occupied: int,
+    own: int,
+    enemy: int,
+) -> int:
+    """Pseudo-legal destination bitboard of a piece on `square` (pawns: pushes and captures)."""
+    if piece_type != chess.PAWN:
+        return _attacks(piece_type, color, square, occupied) & ~own
+
+    targets = squares.PAWN_ATTACKS[color][square] & enemy
+    step = 8 if color == chess.WHITE else -8
+    push = square + step
+    if 0 <= push < 64 and not chess.BB_SQUARES[push] & occupied:
+        targets |= chess.BB_SQUARES[push]
+        if chess.square_rank(square) == (1 if color == chess.WHITE else 6):
+            double = push + step
+            if not chess.BB_SQUARES[double] & occupied:
+                targets |= chess.BB_SQUARES[double]
+    return targets
+
+
+def _pin_ray(
+    board: chess.Board,
+    color: chess.Color,
+    king: chess.Square,
+    square: chess.Square,
+    occupied: int,
+    enemy: int,
+) -> int:
+    """Line a piece on `square` is pinned to (king through enemy slider), or BB_ALL if not pinned."""
+    line = squares.LINE[king][square]
+    if not line or squares.BETWEEN[king][square] & occupied:
+        return chess.BB_ALL
+
+    diagonal = chess.square_file(king) != chess.square_file(square)
+    diagonal &= chess.square_rank(king) != chess.square_rank(square)
+    slider_type = chess.BISHOP if diagonal else chess.ROOK
+    snipers = enemy & (board.queens | (board.bishops if diagonal else board.rooks))
+    beyond = _attacks(slider_type, color, square, occupied) & line & occupied & ~chess.BB_SQUARES[king]
+    if beyond & snipers:
+        return line
+    return chess.BB_ALL
+
+
+def position_mobility_2ply(
+    board: chess.Board,
+    color: chess.Color | str,
+    *,
+    approximate: bool = False,
+) -> float:
+    """
+    Two-stage mobility: squares each piece can reach in one or two of its own moves, weighted
+    like position_mobility (the other pieces stay where they are).
+
+    The second step is looked up in python-chess's precomputed attack tables from every
+    first-step square, with the occupancy updated for the moved piece, so the cost grows with
+    the number of first-step moves rather than with a push/pop per move. A pawn reaching the
+    back rank takes its second step as the promoted piece. The rook of a castling first step
+    is not moved, so a king's second step after castling can differ from a push/pop replay.
+
+    Args:
+        board: python-chess Board instance.
+        color: chess.WHITE/chess.BLACK or "white"/"black".
+        approximate: If False, first steps are the legal moves, a piece pinned after its first
+            step stays on the pin line and the king avoids attacked squares on its second step.
+            If True, both steps are pseudo-legal table lookups (no legal move generation, pins
+            or checks).
+    """
+    return _mobility_2ply(board, _normalize_color(color), approximate=approximate)
+
+
+def _mobility_2ply(
+    board: chess.Board,
+    color: chess.Color,
+    *,
+    approximate: bool,
+    legal_moves: LegalMoveTable | None = None,
+) -> float:
+    """position_mobility_2ply; legal_moves (of board.turn) is reused when color is to move."""
+    if board.turn != color:
+        board = board.copy(stack=False)
+        board.turn = color
+        board.ep_square = None
+        legal_moves = None
+
+    own = board.occupied_co[color]
+    enemy = board.occupied_co[not color]
+    occupied = board.occupied
+
+    first_steps: dict[chess.Square, int] = {}
+    enemy_attacks: dict[chess.Square, int] = {}
+    king = board.king(color)
+    if approximate:
+        for sq in chess.scan_forward(own):
+            first_steps[sq] = _step_targets(board.piece_type_at(sq), color, sq, occupied, own, enemy)
+    else:
+        if legal_moves is None:
+            legal_moves = _legal_move_table(board)
+        for from_sq, moves in legal_moves.items():
+            first = 0
+            for move in moves:
+                first |= chess.BB_SQUARES[move.to_square]
+            first_steps[from_sq] = first
+        # Enemy attacks with our king lifted off the board, so it cannot step back along a checking ray.
+        without_king = occupied & ~chess.BB_SQUARES[king] if king is not None else occupied
+        for sq in chess.scan_forward(enemy):
+            enemy_attacks[sq] = _attacks(board.piece_type_at(sq), not color, sq, without_king)
+    king_danger = 0
+    for attacks in enemy_attacks.values():
+        king_danger |= attacks
+
+    total = 0.0
+    for sq in chess.scan_forward(own):
+        piece_type = board.piece_type_at(sq)
+        first = first_steps.get(sq, 0)
+        origin = chess.BB_SQUARES[sq]
+        second = 0
+        for target in chess.scan_forward(first):
+            target_bb = chess.BB_SQUARES[target]
+            occupied_after = (occupied & ~origin) | target_bb
+            step = 0
+            # A pawn reaching the back rank moves on as the promoted piece: a queen covers rook and
+            # bishop promotions, a knight the rest.
+            promoted = piece_type == chess.PAWN and target_bb & chess.BB_BACKRANKS
+            for step_type in (chess.QUEEN, chess.KNIGHT) if promoted else (piece_type,):
+                step |= _step_targets(
+                    step_type,
+                    color,
+                    target,
+                    occupied_after,
+                    (own & ~origin) | target_bb,
+                    enemy & ~target_bb,
+                )
+            if not approximate:
+                if piece_type == chess.KING:
+                    danger = king_danger
+                    if target in enemy_attacks:
+                        # The captured piece no longer guards anything.
+                        danger = 0
+                        for attacker, attacks in enemy_attacks.items():
+                            if attacker != target:
+                                danger |= attacks
+                    step &= ~danger
+                elif king is not None:
+                    step &= _pin_ray(board, color, king, target, occupied_after, enemy & ~target_bb)
+            second |= step
+
+        reachable = (first | second) & ~origin
+        total += chess.popcount(reachable) * _MOBILITY_WEIGHTS.get(piece_type, 1.0)
+
+    return total
 
 
 def position_centrality(board: chess.Board, color: chess.Color | str) -> int:
@@ -87,19 +270,184 @@ def position_centrality(board: chess.Board, color: chess.Color | str) -> int:
     Score central presence: +2 for core (d4, e4, d5, e5); +1 for surrounding ring.
     """
     color = _normalize_color(color)
+    return _centrality(board, color)
 
+
+def _centrality(board: chess.Board, color: chess.Color) -> int:
     count = 0
-    for sq in _CENTRAL_SQUARES:
-        piece = board.piece_at(sq)
-        if piece is None or piece.color != color:
-            continue
-        if sq in _CENTER_CORE:
-            count += 2
-        else:
-            count += 1
+    for sq in chess.scan_forward(board.occupied_co[color] & squares.BB_CENTRAL):
+        count += squares.CENTRALITY[sq]
     return count
 
 
+def position_exchange(
+    board: chess.Board,
+    color: chess.Color | str,
+    attack_map: AttackMap | None = None,
+) -> dict[str, int]:
+    """
+    Tactical exchange features for one side, from static exchange evaluation (pawn units).
+
+    Pass the same AttackMap when computing both sides of a position; attacks and per-square
+    exchange results are then computed once.
+
+    Returns:
+        {
+            "hanging_pieces": int,     # own non-king pieces attacked and undefended
+            "material_at_risk": int,   # sum of what the opponent wins by capturing on each own square
+            "best_capture": int,       # best material won by one of this side's captures
+        }
+    """
+    color = _normalize_color(color)
+    if attack_map is None:
+        attack_map = AttackMap(board)
+    return _exchange(board, color, attack_map)
+
+
+def _exchange(board: chess.Board, color: chess.Color, attack_map: AttackMap) -> dict[str, int]:
+    hanging_pieces = 0
+    material_at_risk = 0
+    best_capture = 0
+    kings = board.kings
+    for sq in chess.scan_forward(board.occupied & ~kings):
+        if bool(board.occupied_co[color] & chess.BB_SQUARES[sq]):
+            if not attack_map.attackers(not color, sq):
+                continue
+            hanging_pieces += attack_map.is_hanging(sq)
+            material_at_risk += max(attack_map.static_exchange(sq), 0)
+        elif attack_map.attackers(color, sq):
+            best_capture = max(best_capture, attack_map.static_exchange(sq))
+
+    return {
+        "hanging_pieces": hanging_pieces,
+        "material_at_risk": material_at_risk,
+        "best_capture": best_capture,
+    }
+
+
+class Feature:
+    """A registered feature: compute(board, color, **intermediates) for the intermediates it requires."""
+
+    __slots__ = ("name", "requires", "kind", "compute")
+
+    def __init__(self, name: str, requires: tuple[str, ...], kind: str, compute: Callable[..., Any]) -> None:
+        self.name = name
+        self.requires = requires
+        self.kind = kind
+        self.compute = compute
+
+
+class Intermediate:
+    """Per-position value shared by features, itself computed from other intermediates."""
+
+    __slots__ = ("name", "requires", "compute")
+
+    def __init__(self, name: str, requires: tuple[str, ...], compute: Callable[..., Any]) -> None:
+        self.name = name
+        self.requires = requires
+        self.compute = compute
+
+
+FEATURES: dict[str, Feature] = {}
+INTERMEDIATES: dict[str, Intermediate] = {}
+DEFAULT_FEATURES = ("connection", "mobility", "centrality")
+
+
+def register_intermediate(name: str, requires: Iterable[str] = ()) -> Callable:
+    """Decorator: register fn(board, color, **requires) as a shared per-position intermediate."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        INTERMEDIATES[name] = Intermediate(name, tuple(requires), fn)
+        return fn
+
+    return decorator
+
+
+def register_feature(name: str, requires: Iterable[str] = (), kind: str = "int") -> Callable:
+    """
+    Decorator: register fn(board, color, **requires) as a feature column.
+
+    Args:
+        name: Feature (output column) name.
+        requires: Intermediates passed to fn as keyword arguments.
+        kind: Column kind of the value, "int" or "float".
+    """
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        unknown = [dep for dep in requires if dep not in INTERMEDIATES]
+        if unknown:
+            raise ValueError(f"Feature '{name}' requires unknown intermediates {unknown}")
+        FEATURES[name] = Feature(name, tuple(requires), kind, fn)
+        return fn
+
+    return decorator
+
+
+register_intermediate("pieces")(_side_pieces)
+register_intermediate("legal_moves")(lambda board, color: _legal_move_table(board))
+register_intermediate("attack_map")(lambda board, color: AttackMap(board))
+register_intermediate("exchange", requires=("attack_map",))(_exchange)
+register_intermediate("opponent_exchange", requires=("attack_map",))(
+    lambda board, color, attack_map: _exchange(board, not color, attack_map)
+)
+
+register_feature("connection", requires=("pieces",))(_connection)
+register_feature("mobility", requires=("pieces", "legal_moves"), kind="float")(_mobility)
+register_feature("centrality")(_centrality)
+register_feature("mobility_2ply", requires=("legal_moves",), kind="float")(
+    lambda board, color, legal_moves: _mobility_2ply(board, color, approximate=False, legal_moves=legal_moves)
+)
+register_feature("mobility_2ply_fast", kind="float")(
+    lambda board, color: _mobility_2ply(board, color, approximate=True)
+)
+for _key in ("hanging_pieces", "material_at_risk", "best_capture"):
+    register_feature(_key, requires=("exchange",))(lambda board, color, exchange, _key=_key: exchange[_key])
+    register_feature(f"opponent_{_key}", requires=("opponent_exchange",))(
+        lambda board, color, opponent_exchange, _key=_key: opponent_exchange[_key]
+    )
+
+
+def feature_kinds(names: Iterable[str]) -> list[tuple[str, str]]:
+    """(name, kind) pairs for the requested features; raises ValueError for unknown names."""
+    names = list(names)
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features {unknown}; available: {sorted(FEATURES)}")
+    return [(name, FEATURES[name].kind) for name in names]
+
+
+def compute_features(
+    board: chess.Board,
+    color: chess.Color | str,
+    features: Iterable[str] | None = None,
+) -> dict[str, float | int]:
+    """
+    Compute only the requested features (DEFAULT_FEATURES if None) for one side.
+
+    Each intermediate required by the requested features (legal move table, attack map, piece
+    list, ...) is computed once for the position and shared; intermediates nobody asked for
+    are never computed.
+    """
+    color = _normalize_color(color)
+    names = DEFAULT_FEATURES if features is None else tuple(features)
+    feature_kinds(names)
+
+    cache: dict[str, Any] = {}
+
+    def resolve(name: str) -> Any:
+        if name not in cache:
+            intermediate = INTERMEDIATES[name]
+            deps = {dep: resolve(dep) for dep in intermediate.requires}
+            cache[name] = intermediate.compute(board, color, **deps)
+        return cache[name]
+
+    values: dict[str, float | int] = {}
+    for name in names:
+        feature = FEATURES[name]
+        values[name] = feature.compute(board, color, **{dep: resolve(dep) for dep in feature.requires})
+    return values
+
+
 def position_features(board: chess.Board, color: chess.Color | str) -> dict[str, float | int]:
     """
     Convenience: return core features for the side to move.
@@ -111,9 +459,4 @@ def position_features(board: chess.Board, color: chess.Color | str) -> dict[str,
             "centrality": int,
         }
     """
-    color = _normalize_color(color)
-    return {
-        "connection": position_connection(board, color),
-        "mobility": position_mobility(board, color),
-        "centrality": position_centrality(board, color),
-    }
+    return compute_features(board, color, DEFAULT_FEATURES)
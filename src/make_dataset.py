@@ -5,62 +5,317 @@ Usage:
     PYTHONPATH=. python src/make_dataset.py --pgn data/games.pgn --output data/positions.csv
     PYTHONPATH=. python src/make_dataset.py --csv data/games.csv --output data/positions.parquet
     PYTHONPATH=. python src/make_dataset.py --club-csv data/club_games_data.csv --output data/club_positions.csv
+
+Inputs may be compressed (.gz, .bz2, .xz, .zst); they are decompressed on the fly (src/compressed.py):
+    PYTHONPATH=. python src/make_dataset.py --pgn data/games.pgn.zst --output data/positions.parquet
+
+Games can be replayed in several processes (rows return through shared memory, src/transport.py):
+    PYTHONPATH=. python src/make_dataset.py --pgn data/games.pgn --output data/positions.csv --workers 4
+
+Long builds can be sharded and resumed after a crash (output is then a directory):
+    PYTHONPATH=. python src/make_dataset.py --pgn data/games.pgn --output data/positions --shard-size 1000
+    PYTHONPATH=. python src/make_dataset.py --pgn data/games.pgn --output data/positions --shard-size 1000 --resume
+
+Nightly exports can be ingested incrementally: only games not yet in the dataset (by id, or by
+content hash for sources without ids) are replayed and appended as new shards, optionally together
+with their features:
+    PYTHONPATH=. python src/make_dataset.py --club-csv data/club_games_data.csv --output data/club_positions \
+        --append --features-output data/club_features
+
+Or partitioned by move-number bucket and rating band, for cheap sliced reads (see src/partitions.py):
+    PYTHONPATH=. python src/make_dataset.py --club-csv data/club_games_data.csv --output data/club_positions \
+        --partition --format parquet
 """
 
 import argparse
+import functools
+import hashlib
 import io
 import pathlib
-from typing import Iterable
+from typing import Any, Callable, Iterator
 
 import chess
 import chess.pgn
 import pandas as pd
 
+from src import compressed, partitions, transport
+from src.evaluate_variables import evaluate_frame
+from src.columns import CATEGORY, INT, STR, ColumnBuilder
+from src.sampling import PlySampler
+from src.shards import ShardManifest, is_sharded, shard_name, write_frame, write_quarantine
+
+# (game_index, build) pairs: build(columns) replays the game and appends its positions to the
+# builder, raising ValueError if the game is malformed.
+GameStream = Iterator[tuple[int, Callable[[ColumnBuilder], None]]]
+
+# Column layouts of the positions table per source; repeated strings are stored as categoricals.
+PGN_SCHEMA = [
+    ("game_index", INT),
+    ("ply", INT),
+    ("move_number", INT),
+    # Moves left in the whole game (its last move_number minus this one), measured on the full
+    # replayed game, so later trimming, filtering or sampling of rows never shifts it.
+    ("moves_to_end", INT),
+    ("side_to_move", CATEGORY),
+    ("fen", STR),
+    ("uci", CATEGORY),
+    ("san", CATEGORY),
+    ("result", CATEGORY),
+]
+CSV_SCHEMA = [("game_id", CATEGORY)] + PGN_SCHEMA
+CLUB_SCHEMA = CSV_SCHEMA + [("white_rating", INT), ("black_rating", INT), ("time_control", CATEGORY)]
+_SCHEMAS = {"pgn": PGN_SCHEMA, "csv": CSV_SCHEMA, "club-csv": CLUB_SCHEMA}
+
+# Input games per work unit when games are replayed in worker processes.
+_GAMES_PER_UNIT = 200
+
+_SIDE_NAMES = {chess.WHITE: "white", chess.BLACK: "black"}
+
+
+def _sampled_plies(
+    sampler: PlySampler | None,
+    game_index: int,
+    n_plies: int,
+    min_move_number: int = 1,
+) -> tuple[set[int] | None, int]:
+    """
+    Plies to keep (None: all) and the last ply worth replaying for one game.
+
+    n_plies is the full game length; callers also use it for moves_to_end, which must not be
+    taken from the last kept ply.
+    """
+    if sampler is None:
+        return None, n_plies
+    selected = sampler.select(game_index, n_plies, min_move_number=min_move_number)
+    return set(selected), (selected[-1] if selected else 0)
+
+
+def _positions_from_game(
+    game: chess.pgn.Game,
+    game_index: int,
+    columns: ColumnBuilder,
+    sampler: PlySampler | None = None,
+    strict: bool = True,
+) -> None:
+    """
+    Append a position row (PGN_SCHEMA) for each (sampled) ply in a single game.
+
+    A game with PGN parse errors raises ValueError; with strict=False it keeps the moves read
+    before the first error instead (python-chess ends the mainline there).
+    """
+    if game.errors and strict:
+        raise ValueError(f"PGN parse error: {game.errors[0]}")
 
-def _positions_from_game(game: chess.pgn.Game, game_index: int) -> Iterable[dict]:
-    """Yield position records for each ply in a single game."""
     board = game.board()
     result = game.headers.get("Result", "*")
+    append = columns.append
+    moves = list(game.mainline_moves())
+    keep, last_ply = _sampled_plies(sampler, game_index, len(moves))
+    last_move = (len(moves) + 1) // 2
 
-    for ply, move in enumerate(game.mainline_moves(), start=1):
+    for ply, move in enumerate(moves, start=1):
+        if ply > last_ply:
+            break
+        if keep is not None and ply not in keep:
+            board.push(move)
+            continue
         san = board.san(move)
-        uci = move.uci()
         board.push(move)
-        yield {
-            "game_index": game_index,
-            "ply": ply,
-            "move_number": (ply + 1) // 2,
-            "side_to_move": "white" if board.turn == chess.WHITE else "black",
-            "fen": board.fen(),
-            "uci": uci,
-            "san": san,
-            "result": result,
-        }
+        move_number = (ply + 1) // 2
+        append(
+            game_index,
+            ply,
+            move_number,
+            last_move - move_number,
+            _SIDE_NAMES[board.turn],
+            board.fen(),
+            move.uci(),
+            san,
+            result,
+        )
 
 
-def load_pgn_positions(pgn_path: str | pathlib.Path, max_games: int | None = None) -> pd.DataFrame:
+def _pgn_games(
+    handle: io.TextIOBase,
+    *,
+    max_games: int | None = None,
+    skip: Callable[[int], bool] | None = None,
+    start_index: int = 0,
+    sampler: PlySampler | None = None,
+    strict: bool = True,
+) -> GameStream:
+    """
+    Stream games from an open PGN handle.
+
+    Games for which skip(game_index) is true are consumed with chess.pgn.skip_game (headers and
+    movetext are not parsed). start_index is the number of games already consumed before the
+    handle's current position.
+    """
+    game_index = start_index
+    while max_games is None or game_index < max_games:
+        game_index += 1
+        if skip is not None and skip(game_index):
+            if not chess.pgn.skip_game(handle):
+                break
+            continue
+        game = chess.pgn.read_game(handle)
+        if game is None:
+            break
+        yield game_index, functools.partial(
+            _positions_from_game, game, game_index, sampler=sampler, strict=strict
+        )
+
+
+def _collect_positions(
+    games: GameStream,
+    columns: ColumnBuilder,
+    quarantine: list[dict] | None,
+) -> ColumnBuilder:
+    """
+    Replay every game in the stream into the column builder.
+
+    A game raising ValueError is dropped as a whole (its partial rows are truncated); it is
+    appended to quarantine when a list is given, otherwise the error propagates.
+    """
+    for game_index, build in games:
+        start = len(columns)
+        try:
+            build(columns)
+        except ValueError as exc:
+            columns.truncate(start)
+            if quarantine is None:
+                raise
+            quarantine.append({"game_index": game_index, "error": str(exc)})
+    return columns
+
+
+def _pgn_units(
+    pgn_path: pathlib.Path,
+    max_games: int | None,
+    games_per_unit: int = _GAMES_PER_UNIT,
+) -> list[tuple[str, int, int, int]]:
+    """
+    Split a PGN file into (path, offset, start_index, n_games) blocks of games_per_unit games.
+
+    Games are only skipped (chess.pgn.skip_game), not parsed, to find the block offsets.
+    Compressed PGN cannot be split by offset and is refused.
+    """
+    if compressed.is_compressed(pgn_path):
+        raise ValueError(f"Cannot split compressed '{pgn_path}' across workers; use workers=1")
+    units: list[tuple[str, int, int, int]] = []
+    start_index = 0
+    with pgn_path.open("r", encoding="utf-8") as handle:
+        while max_games is None or start_index < max_games:
+            offset = handle.tell()
+            n_games = 0
+            while n_games < games_per_unit and chess.pgn.skip_game(handle):
+                n_games += 1
+            if max_games is not None:
+                n_games = min(n_games, max_games - start_index)
+            if not n_games:
+                break
+            units.append((str(pgn_path), offset, start_index, n_games))
+            start_index += n_games
+    return units
+
+
+def _replay_unit(unit: Any, *, source: str, **options: Any) -> tuple[ColumnBuilder, list[dict]]:
+    """Worker side of _replay_parallel: replay one block of games, quarantining malformed ones."""
+    quarantined: list[dict] = []
+    columns = ColumnBuilder(_SCHEMAS[source])
+    if source == "pgn":
+        path, offset, start_index, n_games = unit
+        with open(path, "r", encoding="utf-8") as handle:
+            handle.seek(offset)
+            games = _pgn_games(handle, max_games=start_index + n_games, start_index=start_index, **options)
+            _collect_positions(games, columns, quarantined)
+    elif source == "csv":
+        _collect_positions(_csv_games(unit, **options), columns, quarantined)
+    else:
+        _collect_positions(_club_games(unit, **options), columns, quarantined)
+    return columns, quarantined
+
+
+def _replay_parallel(
+    source: str,
+    units: list[Any],
+    *,
+    workers: int,
+    quarantine: list[dict] | None,
+    **options: Any,
+) -> pd.DataFrame:
+    """
+    Replay blocks of games in worker processes, returning the rows through shared buffers.
+
+    units are PGN blocks from _pgn_units or slices of the games DataFrame; options are passed to
+    the source's game stream (sampler, club filters). Rows come back in game order.
+    """
+    df, quarantined = transport.run_columnar(
+        functools.partial(_replay_unit, source=source, **options),
+        units,
+        _SCHEMAS[source],
+        workers=workers,
+    )
+    if quarantined and quarantine is None:
+        raise ValueError(quarantined[0]["error"])
+    if quarantine is not None:
+        quarantine.extend(quarantined)
+    return df
+
+
+def _game_blocks(df_games: pd.DataFrame, max_games: int | None) -> list[pd.DataFrame]:
+    if max_games is not None:
+        df_games = df_games.loc[df_games.index < max_games]
+    starts = range(0, len(df_games), _GAMES_PER_UNIT)
+    return [df_games.iloc[start : start + _GAMES_PER_UNIT] for start in starts]
+
+
+def load_pgn_positions(
+    pgn_path: str | pathlib.Path,
+    max_games: int | None = None,
+    *,
+    quarantine: list[dict] | None = None,
+    sampler: PlySampler | None = None,
+    workers: int = 1,
+) -> pd.DataFrame:
     """
     Load positions from a PGN file into a DataFrame.
 
     Args:
         pgn_path: Path to a PGN file.
         max_games: Optional limit on number of games to parse.
+        quarantine: If given, malformed games are skipped and recorded here. If None, a game with
+            an illegal or unparseable move keeps the positions before the error (python-chess
+            stops its mainline there), as before quarantining existed.
+        sampler: If given, only the plies it selects per game become positions.
+        workers: Number of processes replaying games (see _replay_parallel).
     """
-    records: list[dict] = []
     pgn_path = pathlib.Path(pgn_path)
+    if workers > 1:
+        units = _pgn_units(pgn_path, max_games)
+        strict = quarantine is not None
+        return _replay_parallel(
+            "pgn", units, workers=workers, quarantine=quarantine, sampler=sampler, strict=strict
+        )
 
-    with pgn_path.open("r", encoding="utf-8") as handle:
-        game_idx = 0
-        while True:
-            if max_games is not None and game_idx >= max_games:
-                break
-            game = chess.pgn.read_game(handle)
-            if game is None:
-                break
-            game_idx += 1
-            records.extend(_positions_from_game(game, game_idx))
+    with compressed.open_text(pgn_path) as handle:
+        games = _pgn_games(handle, max_games=max_games, sampler=sampler, strict=quarantine is not None)
+        columns = _collect_positions(games, ColumnBuilder(PGN_SCHEMA), quarantine)
+
+    return columns.to_frame()
+
+
+# Text columns of games CSVs, read as str so that every reader (whole file, or one work unit)
+# gets the same types whatever the values look like (e.g. time_control "600", numeric ids).
+_GAMES_CSV_DTYPES = {
+    name: str for name in ("id", "moves", "winner", "time_control", "pgn", "white_result", "black_result")
+}
 
-    return pd.DataFrame(records)
+
+def _read_games_csv(csv_path: pathlib.Path) -> pd.DataFrame:
+    """Read a games CSV, decompressing .gz/.bz2/.xz/.zst input in a background thread."""
+    with compressed.open_text(csv_path) as handle:
+        return pd.read_csv(handle, dtype=_GAMES_CSV_DTYPES)
 
 
 def _winner_to_result(winner: str) -> str:
@@ -86,48 +341,86 @@ def _color_results_to_result(white_result: str | None, black_result: str | None)
     return None
 
 
-def load_csv_positions(csv_path: str | pathlib.Path, max_games: int | None = None) -> pd.DataFrame:
-    """
-    Load positions from a CSV file with a 'moves' column of SAN strings.
+def _positions_from_csv_row(
+    row: pd.Series,
+    idx: int,
+    columns: ColumnBuilder,
+    sampler: PlySampler | None = None,
+) -> None:
+    """Replay one CSV row of space-separated SAN moves, appending CSV_SCHEMA rows for (sampled) plies."""
+    moves_raw = row.get("moves", "")
+    if pd.isna(moves_raw) or not isinstance(moves_raw, str) or not moves_raw.strip():
+        return
 
-    Expected columns (minimum): id (optional), moves (space-separated SAN), winner (optional).
-    """
-    csv_path = pathlib.Path(csv_path)
-    df_games = pd.read_csv(csv_path)
+    board = chess.Board()
+    result = _winner_to_result(row.get("winner", "*"))
+    game_id = row.get("id", idx + 1)
+    game_index = idx + 1
+    append = columns.append
+    sans = moves_raw.split()
+    keep, last_ply = _sampled_plies(sampler, game_index, len(sans))
+    last_move = (len(sans) + 1) // 2
+
+    for ply, san in enumerate(sans, start=1):
+        if ply > last_ply:
+            break
+        move = board.parse_san(san)
+        board.push(move)
+        if keep is not None and ply not in keep:
+            continue
+        side = _SIDE_NAMES[board.turn]
+        move_number = (ply + 1) // 2
+        append(
+            game_id,
+            game_index,
+            ply,
+            move_number,
+            last_move - move_number,
+            side,
+            board.fen(),
+            move.uci(),
+            san,
+            result,
+        )
 
-    records: list[dict] = []
+
+def _csv_games(
+    df_games: pd.DataFrame,
+    *,
+    max_games: int | None = None,
+    sampler: PlySampler | None = None,
+) -> GameStream:
     for idx, row in df_games.iterrows():
         if max_games is not None and idx >= max_games:
             break
+        yield idx + 1, functools.partial(_positions_from_csv_row, row, idx, sampler=sampler)
 
-        moves_raw = row.get("moves", "")
-        if pd.isna(moves_raw) or not isinstance(moves_raw, str) or not moves_raw.strip():
-            continue
 
-        board = chess.Board()
-        result = _winner_to_result(row.get("winner", "*"))
-        game_id = row.get("id", idx + 1)
-        game_index = idx + 1
+def load_csv_positions(
+    csv_path: str | pathlib.Path,
+    max_games: int | None = None,
+    *,
+    quarantine: list[dict] | None = None,
+    sampler: PlySampler | None = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Load positions from a CSV file with a 'moves' column of SAN strings.
 
-        for ply, san in enumerate(moves_raw.split(), start=1):
-            move = board.parse_san(san)
-            uci = move.uci()
-            board.push(move)
-            records.append(
-                {
-                    "game_id": game_id,
-                    "game_index": game_index,
-                    "ply": ply,
-                    "move_number": (ply + 1) // 2,
-                    "side_to_move": "white" if board.turn == chess.WHITE else "black",
-                    "fen": board.fen(),
-                    "uci": uci,
-                    "san": san,
-                    "result": result,
-                }
-            )
+    Expected columns (minimum): id (optional), moves (space-separated SAN), winner (optional).
+    Games with unparseable moves are recorded in quarantine (if given) instead of raising.
+    If a sampler is given, only the plies it selects per game become positions. With
+    workers > 1, games are replayed in that many processes.
+    """
+    csv_path = pathlib.Path(csv_path)
+    df_games = _read_games_csv(csv_path)
+    if workers > 1:
+        units = _game_blocks(df_games, max_games)
+        return _replay_parallel("csv", units, workers=workers, quarantine=quarantine, sampler=sampler)
 
-    return pd.DataFrame(records)
+    games = _csv_games(df_games, max_games=max_games, sampler=sampler)
+    columns = _collect_positions(games, ColumnBuilder(CSV_SCHEMA), quarantine)
+    return columns.to_frame()
 
 
 def _time_control_seconds(tc: str) -> int | None:
@@ -158,6 +451,114 @@ def _time_control_seconds(tc: str) -> int | None:
         return None
 
 
+def _positions_from_club_row(
+    row: pd.Series,
+    idx: int,
+    columns: ColumnBuilder,
+    *,
+    min_rating: int,
+    min_time_control_seconds: int,
+    min_move_number: int,
+    sampler: PlySampler | None = None,
+    strict: bool = True,
+) -> None:
+    """
+    Apply the club filters to one CSV row and replay its PGN, appending CLUB_SCHEMA rows.
+
+    PGN parse errors raise ValueError, or with strict=False keep the moves before the first error.
+    """
+    white_rating = row.get("white_rating")
+    black_rating = row.get("black_rating")
+    tc_seconds = _time_control_seconds(row.get("time_control"))
+
+    if pd.isna(white_rating) or pd.isna(black_rating):
+        return
+    if int(white_rating) < min_rating or int(black_rating) < min_rating:
+        return
+    if tc_seconds is None or tc_seconds < min_time_control_seconds:
+        return
+
+    pgn_text = row.get("pgn")
+    if not isinstance(pgn_text, str) or not pgn_text.strip():
+        return
+
+    game = chess.pgn.read_game(io.StringIO(pgn_text))
+    if game is None:
+        return
+    if game.errors and strict:
+        raise ValueError(f"PGN parse error: {game.errors[0]}")
+
+    result = game.headers.get("Result")
+    if not result or result == "*":
+        color_result = _color_results_to_result(row.get("white_result"), row.get("black_result"))
+        if color_result:
+            result = color_result
+        else:
+            result = _winner_to_result(row.get("winner")) if "winner" in row else "*"
+
+    board = game.board()
+    game_id = row.get("id", idx + 1)
+    game_index = idx + 1
+    result = result or "*"
+    white_rating = int(white_rating)
+    black_rating = int(black_rating)
+    time_control = row.get("time_control")
+    append = columns.append
+    moves = list(game.mainline_moves())
+    keep, last_ply = _sampled_plies(sampler, game_index, len(moves), min_move_number)
+    last_move = (len(moves) + 1) // 2
+
+    for ply, move in enumerate(moves, start=1):
+        if ply > last_ply:
+            break
+        move_number = (ply + 1) // 2
+        if move_number < min_move_number or (keep is not None and ply not in keep):
+            board.push(move)
+            continue
+        san = board.san(move)
+        board.push(move)
+        append(
+            game_id,
+            game_index,
+            ply,
+            move_number,
+            last_move - move_number,
+            _SIDE_NAMES[board.turn],
+            board.fen(),
+            move.uci(),
+            san,
+            result,
+            white_rating,
+            black_rating,
+            time_control,
+        )
+
+
+def _club_games(
+    df_games: pd.DataFrame,
+    *,
+    max_games: int | None = None,
+    min_rating: int = 1700,
+    min_time_control_seconds: int = 600,
+    min_move_number: int = 11,
+    sampler: PlySampler | None = None,
+    strict: bool = True,
+) -> GameStream:
+    for idx, row in df_games.iterrows():
+        if max_games is not None and idx >= max_games:
+            break
+        yield idx + 1, functools.partial(
+            _positions_from_club_row,
+            row,
+            idx,
+            min_rating=min_rating,
+            min_time_control_seconds=min_time_control_seconds,
+            min_move_number=min_move_number,
+            sampler=sampler,
+            strict=strict,
+        )
+
+
 def load_club_csv_positions(
     csv_path: str | pathlib.Path,
     *,
@@ -165,6 +566,9 @@ def load_club_csv_positions(
     min_rating: int = 1700,
     min_time_control_seconds: int = 600,
     min_move_number: int = 11,
+    quarantine: list[dict] | None = None,
+    sampler: PlySampler | None = None,
+    workers: int = 1,
 ) -> pd.DataFrame:
     """
     Load and filter club game data (chess.com CSV with PGN column).
@@ -173,83 +577,49 @@ def load_club_csv_positions(
       - Both ratings >= min_rating.
       - Time control >= min_time_control_seconds (per side).
       - Only positions with move_number >= min_move_number (i.e., after move 10 by default).
+
+    Games whose PGN fails to parse are recorded in quarantine (if given); without a quarantine
+    list they keep the positions before the first error, as before quarantining existed.
+    If a sampler is given, only the plies it selects per game (among those kept by the
+    filters) become positions. With workers > 1, games are replayed in that many processes.
     """
     csv_path = pathlib.Path(csv_path)
-    df_games = pd.read_csv(csv_path)
-
-    records: list[dict] = []
+    df_games = _read_games_csv(csv_path)
+    filters = {
+        "min_rating": min_rating,
+        "min_time_control_seconds": min_time_control_seconds,
+        "min_move_number": min_move_number,
+        "strict": quarantine is not None,
+    }
+    if workers > 1:
+        units = _game_blocks(df_games, max_games)
+        return _replay_parallel(
+            "club-csv", units, workers=workers, quarantine=quarantine, sampler=sampler, **filters
+        )
 
-    for idx, row in df_games.iterrows():
-        if max_games is not None and idx >= max_games:
-            break
+    games = _club_games(df_games, max_games=max_games, sampler=sampler, **filters)
+    columns = _collect_positions(games, ColumnBuilder(CLUB_SCHEMA), quarantine)
+    return columns.to_frame()
 
-        white_rating = row.get("white_rating")
-        black_rating = row.get("black_rating")
-        tc_seconds = _time_control_seconds(row.get("time_control"))
 
-        if pd.isna(white_rating) or pd.isna(black_rating):
-            continue
-        if int(white_rating) < min_rating or int(black_rating) < min_rating:
-            continue
-        if tc_seconds is None or tc_seconds < min_time_control_seconds:
-            continue
-
-        pgn_text = row.get("pgn")
-        if not isinstance(pgn_text, str) or not pgn_text.strip():
-            continue
-
-        game = chess.pgn.read_game(io.StringIO(pgn_text))
-        if game is None:
-            continue
-
-        result = game.headers.get("Result")
-        if not result or result == "*":
-            color_result = _color_results_to_result(row.get("white_result"), row.get("black_result"))
-            if color_result:
-                result = color_result
-            else:
-                result = _winner_to_result(row.get("winner")) if "winner" in row else "*"
-
-        board = game.board()
-        game_id = row.get("id", idx + 1)
-        game_index = idx + 1
-
-        for ply, move in enumerate(game.mainline_moves(), start=1):
-            san = board.san(move)
-            board.push(move)
-            move_number = (ply + 1) // 2
-            if move_number < min_move_number:
-                continue
-            records.append(
-                {
-                    "game_id": game_id,
-                    "game_index": game_index,
-                    "ply": ply,
-                    "move_number": move_number,
-                    "side_to_move": "white" if board.turn == chess.WHITE else "black",
-                    "fen": board.fen(),
-                    "uci": move.uci(),
-                    "san": san,
-                    "result": result or "*",
-                    "white_rating": int(white_rating),
-                    "black_rating": int(black_rating),
-                    "time_control": row.get("time_control"),
-                }
-            )
-
-    return pd.DataFrame(records)
-
-
-def _trim_last_moves(df: pd.DataFrame, trim_last_moves: int) -> pd.DataFrame:
+def _trim_last_moves(df: pd.DataFrame | str | pathlib.Path, trim_last_moves: int) -> pd.DataFrame:
     """
     Drop the last N moves (by move_number) for each game.
 
+    Uses moves_to_end (recorded by the loaders from the full game) when present; otherwise
+    falls back to the last move_number of each game among the rows of df.
+
     Args:
-        df: Positions DataFrame containing 'game_index' and 'move_number'.
+        df: Positions DataFrame containing 'moves_to_end', or 'game_index' and 'move_number', or
+            the path of a partitioned dataset (the trim is then pushed down to the reader).
         trim_last_moves: Number of final moves per game to remove.
     """
+    if not isinstance(df, pd.DataFrame):
+        return partitions.read_partitioned(df, trim_last_moves=max(trim_last_moves, 0))
     if trim_last_moves <= 0:
         return df
+    if "moves_to_end" in df.columns:
+        return df.loc[df["moves_to_end"] >= trim_last_moves].copy()
     if "game_index" not in df.columns or "move_number" not in df.columns:
         raise ValueError("DataFrame must include 'game_index' and 'move_number' columns to trim moves")
 
@@ -261,45 +631,477 @@ def _trim_last_moves(df: pd.DataFrame, trim_last_moves: int) -> pd.DataFrame:
 
 
 def _write_output(df: pd.DataFrame, output_path: str | pathlib.Path, fmt: str) -> None:
-    output_path = pathlib.Path(output_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    write_frame(df, output_path, fmt)
+
+
+def build_sharded_dataset(
+    source: str,
+    input_path: str | pathlib.Path,
+    output_dir: str | pathlib.Path,
+    *,
+    games_per_shard: int = 1000,
+    fmt: str = "csv",
+    resume: bool = False,
+    max_games: int | None = None,
+    trim_last_moves: int = 0,
+    partition: dict[str, int] | None = None,
+    sampler: PlySampler | None = None,
+    **club_filters: int,
+) -> ShardManifest:
+    """
+    Build a positions dataset as a directory of shards, one shard per block of input games.
+
+    Each finished shard is recorded in output_dir/manifest.json together with its game range
+    (and, for PGN input, the byte offset after its last game). With resume=True, finished shards
+    are skipped: PGN input seeks past the finished prefix and skips later finished games without
+    parsing them, CSV input skips them without replaying. Malformed games are written to
+    output_dir/quarantine.jsonl and never abort the build.
+
+    Args:
+        source: "pgn", "csv" or "club-csv".
+        input_path: Input file for the chosen source.
+        output_dir: Directory for shards, manifest and quarantine file.
+        games_per_shard: Number of input games per shard.
+        fmt: Shard format, "csv" or "parquet".
+        resume: Continue an interrupted build in output_dir.
+        max_games: Optional limit on number of games to parse.
+        trim_last_moves: Drop the last N moves of every game (applied per shard).
+        partition: If given (e.g. {"move_bucket_size": 10, "rating_band_size": 200}), output_dir
+            is also a partitioned dataset and each shard is split across the partitions.
+        sampler: If given, only the plies it selects per game become positions (set its own
+            trim_last_moves instead of trim_last_moves).
+        club_filters: Keyword filters for load_club_csv_positions (min_rating, ...).
+
+    Returns:
+        The completed ShardManifest.
+    """
+    if source not in ("pgn", "csv", "club-csv"):
+        raise ValueError(f"Unsupported source '{source}'")
+    if games_per_shard <= 0:
+        raise ValueError("games_per_shard must be positive")
+    if sampler is not None and trim_last_moves > 0:
+        raise ValueError("With a sampler, trim through PlySampler(trim_last_moves=...)")
+
+    input_path = pathlib.Path(input_path)
+    settings = {
+        "source": source,
+        "input": str(input_path),
+        "games_per_shard": games_per_shard,
+        "format": fmt,
+        "max_games": max_games,
+        "trim_last_moves": trim_last_moves,
+        "partition": partition,
+        "sampler": sampler.settings() if sampler is not None else None,
+        **club_filters,
+    }
+    manifest = ShardManifest.open(output_dir, settings, resume=resume)
+    if manifest.complete:
+        return manifest
+
+    writer = None
+    if partition is not None:
+        partitions.write_spec(output_dir, fmt, **partition)
+        writer = lambda df, key: partitions.write_partitioned(df, output_dir, part=key)  # noqa: E731
+
+    def shard_of(game_index: int) -> int:
+        return (game_index - 1) // games_per_shard
+
+    schema = _SCHEMAS[source]
+
+    def commit(shard_id: int, columns: ColumnBuilder, quarantined: list[dict], **info: int) -> None:
+        df = columns.to_frame()
+        if not df.empty and trim_last_moves > 0:
+            df = _trim_last_moves(df, trim_last_moves)
+        first_game = shard_id * games_per_shard + 1
+        manifest.commit(
+            shard_id,
+            df,
+            fmt,
+            quarantined=quarantined,
+            writer=writer,
+            first_game=first_game,
+            last_game=first_game + games_per_shard - 1,
+            **info,
+        )
+
+    handle = None
+    try:
+        if source == "pgn":
+            handle = compressed.open_text(input_path)
+            # Seek past the longest run of finished shards, then skip any stragglers (compressed
+            # input cannot seek, so it skips its way through the finished shards).
+            done_prefix = 0
+            while manifest.is_done(done_prefix):
+                done_prefix += 1
+            start_index = 0
+            if done_prefix:
+                end_offset = manifest.shards[shard_name(done_prefix - 1)].get("end_offset")
+                if end_offset is not None and handle.seekable():
+                    handle.seek(end_offset)
+                    start_index = done_prefix * games_per_shard
+            skip = lambda game_index: manifest.is_done(shard_of(game_index))  # noqa: E731
+            games = _pgn_games(
+                handle, max_games=max_games, skip=skip, start_index=start_index, sampler=sampler
+            )
+        elif source == "csv":
+            games = _csv_games(_read_games_csv(input_path), max_games=max_games, sampler=sampler)
+        else:
+            df_games = _read_games_csv(input_path)
+            games = _club_games(df_games, max_games=max_games, sampler=sampler, **club_filters)
+
+        seekable = handle is not None and handle.seekable()
+        current: int | None = None
+        columns = ColumnBuilder(schema)
+        quarantined: list[dict] = []
+        for game_index, build in games:
+            shard_id = shard_of(game_index)
+            if manifest.is_done(shard_id):
+                continue
+            if shard_id != current:
+                if current is not None:
+                    commit(current, columns, quarantined)
+                current, columns, quarantined = shard_id, ColumnBuilder(schema), []
+
+            _collect_positions(iter([(game_index, build)]), columns, quarantined)
+
+            if game_index % games_per_shard == 0:
+                info = {"end_offset": handle.tell()} if seekable else {}
+                commit(shard_id, columns, quarantined, **info)
+                current = None
+
+        if current is not None:
+            info = {"end_offset": handle.tell()} if seekable else {}
+            commit(current, columns, quarantined, **info)
+    finally:
+        if handle is not None:
+            handle.close()
+
+    manifest.finish()
+    return manifest
+
+
+def plan_queue_units(
+    source: str,
+    input_path: str | pathlib.Path,
+    *,
+    games_per_unit: int = 1000,
+    max_games: int | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Split an input into work units for a distributed build (see src/workqueue.py).
+
+    Units are byte offsets, found by skipping PGN games or scanning CSV rows
+    (compressed.csv_blocks), and carry the game_index numbering of a single-process build.
+    """
+    if source not in ("pgn", "csv", "club-csv"):
+        raise ValueError(f"Unsupported source '{source}'")
+    if games_per_unit <= 0:
+        raise ValueError("games_per_unit must be positive")
+    input_path = pathlib.Path(input_path)
+    if source == "pgn":
+        return [
+            {"offset": offset, "start_index": start_index, "n_games": n_games}
+            for _, offset, start_index, n_games in _pgn_units(input_path, max_games, games_per_unit)
+        ]
+
+    return [
+        {"offset": offset, "start_index": start_index, "n_games": n_games}
+        for offset, start_index, n_games in compressed.csv_blocks(input_path, games_per_unit, max_games)
+    ]
+
+
+def process_queue_unit(unit: dict[str, Any], settings: dict[str, Any]) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    Replay one work unit of a distributed build; returns its positions and quarantined games.
+
+    settings holds source, input, trim_last_moves, sampler (PlySampler.settings() or None) and
+    any club filters.
+    """
+    options = dict(settings)
+    source = options.pop("source")
+    input_path = pathlib.Path(options.pop("input"))
+    trim_last_moves = options.pop("trim_last_moves", 0)
+    sampler_settings = options.pop("sampler", None)
+    sampler = PlySampler(**sampler_settings) if sampler_settings else None
+
+    quarantined: list[dict] = []
+    columns = ColumnBuilder(_SCHEMAS[source])
+    start_index, n_games = unit["start_index"], unit["n_games"]
+    if source == "pgn":
+        with compressed.open_text(input_path) as handle:
+            handle.seek(unit["offset"])
+            games = _pgn_games(
+                handle, max_games=start_index + n_games, start_index=start_index, sampler=sampler
+            )
+            _collect_positions(games, columns, quarantined)
+    else:
+        df_games = compressed.read_csv_block(input_path, unit["offset"], n_games, dtype=_GAMES_CSV_DTYPES)
+        df_games.index = pd.RangeIndex(start_index, start_index + len(df_games))
+        if source == "csv":
+            games = _csv_games(df_games, sampler=sampler)
+        else:
+            games = _club_games(df_games, sampler=sampler, **options)
+        _collect_positions(games, columns, quarantined)
+
+    df = columns.to_frame()
+    if not df.empty and trim_last_moves > 0:
+        df = _trim_last_moves(df, trim_last_moves)
+    return df, quarantined
+
+
+def _content_key(*parts: str) -> str:
+    return "sha1:" + hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
 
-    if fmt == "csv":
-        df.to_csv(output_path, index=False)
-    elif fmt == "parquet":
-        df.to_parquet(output_path, index=False)
+
+def _game_key(game: chess.pgn.Game) -> str:
+    """Content hash of a PGN game (headers and mainline), for sources without game ids."""
+    headers = "\n".join(f"{name}={value}" for name, value in game.headers.items())
+    return _content_key(headers, " ".join(move.uci() for move in game.mainline_moves()))
+
+
+def _row_keys(df_games: pd.DataFrame, content_cols: list[str]) -> list[str]:
+    """The id column as "id:<id>" where present, otherwise a hash of the row's game content."""
+    missing = pd.Series(None, index=df_games.index, dtype=object)
+    ids = df_games.get("id", missing)
+    content = df_games.reindex(columns=content_cols).astype(str)
+    return [
+        f"id:{game_id}" if not pd.isna(game_id) else _content_key(*values)
+        for game_id, values in zip(ids, content.itertuples(index=False))
+    ]
+
+
+def _new_games(
+    source: str,
+    input_path: pathlib.Path,
+    known: set[str],
+    *,
+    start_index: int,
+    sampler: PlySampler | None,
+    **club_filters: int,
+) -> Iterator[tuple[str, int, Callable[[ColumnBuilder], None]]]:
+    """
+    Stream (key, game_index, build) for the games of an input whose key is not in known.
+
+    New games are numbered on from start_index and their keys added to known, so a game
+    repeated within the input is ingested once.
+    """
+    game_index = start_index
+    if source == "pgn":
+        with compressed.open_text(input_path) as handle:
+            while (game := chess.pgn.read_game(handle)) is not None:
+                key = _game_key(game)
+                if key in known:
+                    continue
+                known.add(key)
+                game_index += 1
+                build = functools.partial(_positions_from_game, game, game_index, sampler=sampler)
+                yield key, game_index, build
+        return
+
+    df_games = _read_games_csv(input_path)
+    content_cols = ["moves", "winner"] if source == "csv" else ["pgn"]
+    new_keys: list[str] = []
+    is_new: list[bool] = []
+    for key in _row_keys(df_games, content_cols):
+        is_new.append(key not in known)
+        if is_new[-1]:
+            known.add(key)
+            new_keys.append(key)
+    new_rows = df_games.loc[is_new]
+    # Renumber so the game streams (game_index = row label + 1) continue from start_index.
+    new_rows.index = pd.RangeIndex(start_index, start_index + len(new_rows))
+    if source == "csv":
+        games = _csv_games(new_rows, sampler=sampler)
     else:
-        raise ValueError(f"Unsupported format '{fmt}'")
+        games = _club_games(new_rows, sampler=sampler, **club_filters)
+    for key, (game_index, build) in zip(new_keys, games):
+        yield key, game_index, build
+
+
+def append_to_dataset(
+    source: str,
+    input_path: str | pathlib.Path,
+    output_dir: str | pathlib.Path,
+    *,
+    features_dir: str | pathlib.Path | None = None,
+    feature_names: list[str] | None = None,
+    games_per_shard: int = 1000,
+    fmt: str = "csv",
+    max_games: int | None = None,
+    trim_last_moves: int = 0,
+    partition: dict[str, int] | None = None,
+    sampler: PlySampler | None = None,
+    **club_filters: int,
+) -> tuple[ShardManifest, int]:
+    """
+    Add the games of an input that are not yet in a dataset, as new shards.
+
+    output_dir is a sharded positions dataset built by this function (the first run creates
+    it). Every shard records the keys of its games: the input's id column ("id:<id>") or, for
+    sources without ids, a hash of the game content. Later runs (e.g. on tomorrow's export)
+    replay only games whose key is unknown; they are numbered on from the dataset's last
+    game_index and written to new shards. Cost therefore scales with the new games, plus one
+    pass over the input to compute keys (PGN games must be parsed for their hash).
+
+    If features_dir is given, features for the new positions are computed and written to the
+    same-numbered shards of a sharded features dataset there. Feature rows carry game_index and
+    ply; join them to positions on those keys. Their index column is the row number in the
+    concatenated positions dataset (read_sharded order) only for unpartitioned datasets, since
+    partitioned shards are read back in partition order.
+
+    Args:
+        source: "pgn", "csv" or "club-csv".
+        input_path: Input file for the chosen source.
+        output_dir: Positions dataset directory.
+        features_dir: Optional features dataset directory kept in step with output_dir.
+        feature_names: Features to compute (default: features.DEFAULT_FEATURES).
+        games_per_shard: Maximum number of new games per shard.
+        fmt: Shard format, "csv" or "parquet".
+        max_games: Optional limit on the number of new games ingested by this run.
+        trim_last_moves / partition / sampler / club_filters: As for build_sharded_dataset;
+            they must stay the same for every run on a dataset.
+
+    Returns:
+        The positions ShardManifest and the number of new games ingested.
+    """
+    if source not in ("pgn", "csv", "club-csv"):
+        raise ValueError(f"Unsupported source '{source}'")
+    if games_per_shard <= 0:
+        raise ValueError("games_per_shard must be positive")
+    if sampler is not None and trim_last_moves > 0:
+        raise ValueError("With a sampler, trim through PlySampler(trim_last_moves=...)")
+
+    settings = {
+        "mode": "append",
+        "source": source,
+        "games_per_shard": games_per_shard,
+        "format": fmt,
+        "trim_last_moves": trim_last_moves,
+        "partition": partition,
+        "sampler": sampler.settings() if sampler is not None else None,
+        "features_dir": str(features_dir) if features_dir is not None else None,
+        "features": feature_names,
+        **club_filters,
+    }
+    manifest = ShardManifest.open(output_dir, settings, resume=is_sharded(output_dir))
+    features_manifest = None
+    if features_dir is not None:
+        features_settings = {
+            "mode": "append",
+            "positions": str(output_dir),
+            "format": fmt,
+            "features": feature_names,
+        }
+        features_manifest = ShardManifest.open(
+            features_dir, features_settings, resume=is_sharded(features_dir)
+        )
+
+    writer = None
+    if partition is not None:
+        partitions.write_spec(output_dir, fmt, **partition)
+        writer = lambda df, key: partitions.write_partitioned(df, output_dir, part=key)  # noqa: E731
+
+    known = manifest.ingested_keys()
+    shard_id = max((int(key) for key in manifest.shards), default=-1) + 1
+    last_game = max((entry["last_game"] for entry in manifest.shards.values()), default=0)
+    schema = _SCHEMAS[source]
+    new_games = 0
+
+    def commit(columns: ColumnBuilder, quarantined: list[dict], keys: list[str], first_game: int) -> None:
+        df = columns.to_frame()
+        if not df.empty and trim_last_moves > 0:
+            df = _trim_last_moves(df, trim_last_moves).reset_index(drop=True)
+        if features_manifest is not None:
+            feature_quarantine: list[dict] = []
+            df.index = pd.RangeIndex(manifest.rows, manifest.rows + len(df))
+            feature_rows = evaluate_frame(df, quarantine=feature_quarantine, feature_names=feature_names)
+            for position, name in enumerate(("game_index", "ply"), start=1):
+                feature_rows.insert(position, name, df[name].loc[feature_rows["index"]].to_numpy())
+            features_manifest.commit(shard_id, feature_rows, fmt, quarantined=feature_quarantine)
+            df = df.reset_index(drop=True)
+        # Positions last: until the shard is recorded here, a rerun rebuilds it (and its features).
+        manifest.commit(
+            shard_id,
+            df,
+            fmt,
+            quarantined=quarantined,
+            writer=writer,
+            keys=keys,
+            first_game=first_game,
+            last_game=first_game + len(keys) - 1,
+        )
+
+    games = _new_games(
+        source, pathlib.Path(input_path), known, start_index=last_game, sampler=sampler, **club_filters
+    )
+    columns, quarantined, keys = ColumnBuilder(schema), [], []
+    for key, game_index, build in games:
+        if max_games is not None and new_games >= max_games:
+            break
+        _collect_positions(iter([(game_index, build)]), columns, quarantined)
+        keys.append(key)
+        new_games += 1
+        if len(keys) == games_per_shard:
+            commit(columns, quarantined, keys, game_index - len(keys) + 1)
+            shard_id += 1
+            columns, quarantined, keys = ColumnBuilder(schema), [], []
+    if keys:
+        commit(columns, quarantined, keys, last_game + new_games - len(keys) + 1)
+
+    manifest.finish()
+    if features_manifest is not None:
+        features_manifest.finish()
+    return manifest, new_games
 
 
 def filter_positions_by_move_range(
-    df: pd.DataFrame,
+    df: pd.DataFrame | str | pathlib.Path,
     *,
     min_move_number: int | None = None,
     max_move_number: int | None = None,
+    min_rating: int | None = None,
+    max_rating: int | None = None,
 ) -> pd.DataFrame:
     """
-    Filter a positions DataFrame (e.g., club_positions.csv) by move_number inclusive bounds.
+    Filter positions (e.g., club_positions.csv) by move_number and rating inclusive bounds.
 
     Args:
-        df: DataFrame containing a 'move_number' column.
+        df: DataFrame containing a 'move_number' column, or the path of a partitioned dataset
+            written with --partition (only the matching partition files are then read).
         min_move_number: Keep positions with move_number >= this (if provided).
         max_move_number: Keep positions with move_number <= this (if provided).
+        min_rating: Keep positions where both players are rated >= this (if provided).
+        max_rating: Keep positions where both players are rated <= this (if provided).
 
     Returns:
         Filtered DataFrame.
     """
-    if "move_number" not in df.columns:
-        raise ValueError("DataFrame must include a 'move_number' column")
     if min_move_number is not None and max_move_number is not None:
         if min_move_number > max_move_number:
             raise ValueError("min_move_number cannot be greater than max_move_number")
+    if not isinstance(df, pd.DataFrame):
+        return partitions.read_partitioned(
+            df,
+            min_move_number=min_move_number,
+            max_move_number=max_move_number,
+            min_rating=min_rating,
+            max_rating=max_rating,
+        )
+    if "move_number" not in df.columns:
+        raise ValueError("DataFrame must include a 'move_number' column")
+    rating_bounds = min_rating is not None or max_rating is not None
+    if rating_bounds and not {"white_rating", "black_rating"} <= set(df.columns):
+        raise ValueError("DataFrame must include 'white_rating' and 'black_rating' columns for rating bounds")
 
-    mask = pd.Series([True] * len(df))
+    mask = pd.Series(True, index=df.index)
     if min_move_number is not None:
         mask &= df["move_number"] >= min_move_number
     if max_move_number is not None:
         mask &= df["move_number"] <= max_move_number
+    if min_rating is not None:
+        mask &= (df["white_rating"] >= min_rating) & (df["black_rating"] >= min_rating)
+    if max_rating is not None:
+        mask &= (df["white_rating"] <= max_rating) & (df["black_rating"] <= max_rating)
 
     return df.loc[mask].copy()
 
@@ -313,7 +1115,11 @@ def main() -> None:
         "--club-csv",
         help="Path to Chess.com club CSV (expects ratings, time_control, and PGN columns).",
     )
-    parser.add_argument("--output", required=True, help="Output file path (csv or parquet).")
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="Output file path (csv or parquet), or output directory with --shard-size.",
+    )
     parser.add_argument(
         "--format",
         choices=["csv", "parquet"],
@@ -326,9 +1132,128 @@ def main() -> None:
         default=0,
         help="Drop the last N moves (by move_number) from each game before writing output.",
     )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=None,
+        help="Write a sharded, resumable build with this many games per shard (output is a directory).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted sharded build, skipping shards already finished.",
+    )
+
+    parser.add_argument(
+        "--partition",
+        action="store_true",
+        help="Write a dataset directory partitioned by move-number bucket and rating band.",
+    )
+    parser.add_argument("--move-bucket-size", type=int, default=10, help="Moves per partition bucket.")
+    parser.add_argument("--rating-band-size", type=int, default=200, help="Rating points per partition band.")
+    sampling = parser.add_mutually_exclusive_group()
+    sampling.add_argument("--sample-per-game", type=int, default=None, help="Keep K random plies per game.")
+    sampling.add_argument("--sample-every", type=int, default=None, help="Keep every N-th ply of each game.")
+    sampling.add_argument(
+        "--sample-per-bucket",
+        type=int,
+        default=None,
+        help="Keep K random positions per move-number bucket of each game (see --sample-bucket-size).",
+    )
+    parser.add_argument(
+        "--sample-bucket-size", type=int, default=10, help="Moves per bucket for --sample-per-bucket."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for position sampling.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes replaying games (not with --shard-size).",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Add only games not yet ingested into the output directory, as new shards.",
+    )
+    parser.add_argument(
+        "--features-output",
+        default=None,
+        help="With --append, also write features of the new positions to this dataset directory.",
+    )
+    parser.add_argument(
+        "--features",
+        default=None,
+        help="Comma-separated feature names for --features-output (default: connection,mobility,centrality).",
+    )
 
     args = parser.parse_args()
 
+    if args.resume and args.shard_size is None:
+        parser.error("--resume requires --shard-size")
+    if args.workers > 1 and (args.shard_size is not None or args.append):
+        parser.error("--workers cannot be combined with --shard-size or --append")
+    if args.append and args.resume:
+        parser.error("--append runs need no --resume; rerun them to finish an interrupted run")
+    if args.features_output and not args.append:
+        parser.error("--features-output requires --append")
+    partition = None
+    if args.partition:
+        partition = {"move_bucket_size": args.move_bucket_size, "rating_band_size": args.rating_band_size}
+    sampler = None
+    trim_last_moves = args.trim_last_moves
+    if any(value is not None for value in (args.sample_per_game, args.sample_every, args.sample_per_bucket)):
+        sampler = PlySampler(
+            per_game=args.sample_per_game,
+            every=args.sample_every,
+            per_bucket=args.sample_per_bucket,
+            bucket_size=args.sample_bucket_size,
+            seed=args.seed,
+            trim_last_moves=trim_last_moves,
+        )
+        trim_last_moves = 0
+
+    source, input_path = (
+        ("pgn", args.pgn) if args.pgn else ("csv", args.csv) if args.csv else ("club-csv", args.club_csv)
+    )
+    if args.append:
+        manifest, new_games = append_to_dataset(
+            source,
+            input_path,
+            args.output,
+            features_dir=args.features_output,
+            feature_names=args.features.split(",") if args.features else None,
+            games_per_shard=args.shard_size or 1000,
+            fmt=args.format or "csv",
+            max_games=args.max_games,
+            trim_last_moves=trim_last_moves,
+            partition=partition,
+            sampler=sampler,
+        )
+        print(
+            f"Ingested {new_games} new games; {args.output} now holds {manifest.rows} positions "
+            f"in {len(manifest.shards)} shards ({manifest.quarantined} games quarantined)."
+        )
+        return
+
+    if args.shard_size is not None:
+        manifest = build_sharded_dataset(
+            source,
+            input_path,
+            args.output,
+            games_per_shard=args.shard_size,
+            fmt=args.format or "csv",
+            resume=args.resume,
+            max_games=args.max_games,
+            trim_last_moves=trim_last_moves,
+            partition=partition,
+            sampler=sampler,
+        )
+        print(
+            f"Wrote {manifest.rows} positions in {len(manifest.shards)} shards to {args.output} "
+            f"({manifest.quarantined} games quarantined)."
+        )
+        return
+
     out_fmt = args.format
     if out_fmt is None:
         suffix = pathlib.Path(args.output).suffix.lower()
@@ -337,19 +1262,34 @@ def main() -> None:
         else:
             out_fmt = "csv"
 
+    quarantine: list[dict] = []
+    options = {"quarantine": quarantine, "sampler": sampler, "workers": args.workers}
     if args.pgn:
-        df = load_pgn_positions(args.pgn, max_games=args.max_games)
+        df = load_pgn_positions(args.pgn, max_games=args.max_games, **options)
     elif args.csv:
-        df = load_csv_positions(args.csv, max_games=args.max_games)
+        df = load_csv_positions(args.csv, max_games=args.max_games, **options)
     else:
-        df = load_club_csv_positions(args.club_csv, max_games=args.max_games)
+        df = load_club_csv_positions(args.club_csv, max_games=args.max_games, **options)
 
-    if args.trim_last_moves > 0:
-        df = _trim_last_moves(df, args.trim_last_moves)
+    if quarantine:
+        quarantine_path = f"{args.output}.quarantine.jsonl"
+        write_quarantine(quarantine, quarantine_path)
+        print(f"Quarantined {len(quarantine)} malformed games to {quarantine_path}.")
+
+    if trim_last_moves > 0:
+        df = _trim_last_moves(df, trim_last_moves)
 
     if df.empty:
         raise SystemExit("No positions extracted (empty PGN or zero games parsed).")
 
+    if partition is not None:
+        if partitions.is_partitioned(args.output):
+            raise SystemExit(f"{args.output} already holds a partitioned dataset; choose a new directory.")
+        partitions.write_spec(args.output, out_fmt, **partition)
+        files = partitions.write_partitioned(df, args.output)
+        print(f"Wrote {len(df)} positions in {len(files)} partitions to {args.output} ({out_fmt}).")
+        return
+
     _write_output(df, args.output, out_fmt)
     print(f"Wrote {len(df)} positions to {args.output} ({out_fmt}).")
 
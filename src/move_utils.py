@@ -1,5 +1,47 @@
+"""
+Move and square queries for a single square.
+
+Each query has a string form taking an algebraic square name ("e4") and an index form (suffix
+_at) taking a python-chess square index; the string form only parses the name (see
+squares.parse_square) and calls the index form. Code looping over squares should call the
+index forms.
+"""
+
 import chess
 
+from src.squares import SQUARE_NAMES, parse_square
+
+
+def require_piece(board: chess.Board, sq: chess.Square) -> chess.Piece:
+    """The piece on sq; raises ValueError if the square is empty."""
+    piece = board.piece_at(sq)
+    if piece is None:
+        raise ValueError(f"No piece on square '{SQUARE_NAMES[sq]}'")
+    return piece
+
+
+def moves_for_piece_at(
+    board: chess.Board,
+    sq: chess.Square,
+    *,
+    legal_only: bool = True,
+    san: bool = False,
+) -> list[str]:
+    """moves_for_piece for a square index."""
+    require_piece(board, sq)
+    if san and not legal_only:
+        raise ValueError("SAN output requires legal_only=True")
+
+    from_mask = chess.BB_SQUARES[sq]
+    if legal_only:
+        moves = list(board.generate_legal_moves(from_mask=from_mask))
+    else:
+        moves = list(board.generate_pseudo_legal_moves(from_mask=from_mask))
+
+    if san:
+        return [board.san(m) for m in moves]
+    return [m.uci() for m in moves]
+
 
 def moves_for_piece(
     board: chess.Board,
@@ -17,24 +59,17 @@ def moves_for_piece(
         legal_only: If False, use pseudo-legal moves (ignore check).
         san: If True, return SAN strings; otherwise return UCI strings.
     """
-    try:
-        sq = chess.parse_square(square)
-    except ValueError as exc:
-        raise ValueError(f"Invalid square '{square}'") from exc
+    return moves_for_piece_at(board, parse_square(square), legal_only=legal_only, san=san)
 
-    piece = board.piece_at(sq)
-    if piece is None:
-        raise ValueError(f"No piece on square '{square}'")
 
-    move_iter = board.legal_moves if legal_only else board.generate_pseudo_legal_moves()
-    moves = [m for m in move_iter if m.from_square == sq]
-
-    if san:
-        if not legal_only:
-            raise ValueError("SAN output requires legal_only=True")
-        return [board.san(m) for m in moves]
-
-    return [m.uci() for m in moves]
+def piece_moves_at(board: chess.Board, sq: chess.Square, piece_symbol: str | None = None) -> int:
+    """piece_moves for a square index."""
+    piece = require_piece(board, sq)
+    if piece_symbol is not None and piece.symbol() != piece_symbol:
+        raise ValueError(
+            f"Piece mismatch at '{SQUARE_NAMES[sq]}': found '{piece.symbol()}', expected '{piece_symbol}'"
+        )
+    return sum(1 for _ in board.generate_legal_moves(from_mask=chess.BB_SQUARES[sq]))
 
 
 def piece_moves(
@@ -53,68 +88,45 @@ def piece_moves(
     Returns:
         Integer count of legal moves for the piece on the square.
     """
-    moves = moves_for_piece(board, square, legal_only=True, san=False)
+    return piece_moves_at(board, parse_square(square), piece_symbol)
 
-    if piece_symbol is not None:
-        sq = chess.parse_square(square)
-        piece = board.piece_at(sq)
-        if piece is None:
-            raise ValueError(f"No piece on square '{square}'")
-        if piece.symbol() != piece_symbol:
-            raise ValueError(
-                f"Piece mismatch at '{square}': found '{piece.symbol()}', expected '{piece_symbol}'"
-            )
 
-    return len(moves)
+def legal_attackers_at(board: chess.Board, color: chess.Color, sq: chess.Square) -> list[chess.Square]:
+    """
+    Squares of `color` pieces attacking sq whose move to sq is legal (same rule as
+    square_analysis with legal_only=True: only the side to move has legal moves).
+    """
+    if color != board.turn:
+        return []
+    return [
+        from_sq
+        for from_sq in chess.scan_forward(board.attackers_mask(color, sq))
+        if board.is_legal(chess.Move(from_sq, sq))
+    ]
 
 
-def square_analysis(
+def square_analysis_at(
     board: chess.Board,
-    square: str,
+    sq: chess.Square,
     *,
     legal_only: bool = False,
     include_san: bool = False,
     include_legal_flag: bool = True,
 ) -> dict[str, list[dict]]:
-    """
-    Return pieces that are attacking/protecting a target square in the current position.
-
-    Args:
-        board: python-chess Board instance.
-        square: Target square (e.g., "e4").
-        legal_only: If True, only include pieces whose move to the square is legal
-                    (filters out pinned pieces or illegal due to check/occupancy).
-        include_san: If True, include SAN strings for the move to the square (legal moves only).
-        include_legal_flag: If True, annotate each entry with an "is_legal" boolean.
-
-    Returns:
-        Dict with keys "white" and "black", each a list of dicts:
-        {"from", "piece", "color", "uci", (optional) "san"}.
-    """
-    try:
-        target_sq = chess.parse_square(square)
-    except ValueError as exc:
-        raise ValueError(f"Invalid square '{square}'") from exc
-
-    legal_moves_set = set(board.legal_moves) if (legal_only or include_san or include_legal_flag) else None
-
-    attackers = {
-        "white": board.attackers(chess.WHITE, target_sq),
-        "black": board.attackers(chess.BLACK, target_sq),
-    }
+    """square_analysis for a square index."""
+    check_legal = legal_only or include_san or include_legal_flag
 
     def _entries(side: chess.Color) -> list[dict]:
         entries: list[dict] = []
-        for from_sq in attackers["white" if side == chess.WHITE else "black"]:
+        for from_sq in chess.scan_forward(board.attackers_mask(side, sq)):
             piece = board.piece_at(from_sq)
-            if piece is None:
-                continue
-            move = chess.Move(from_sq, target_sq)
-            is_legal = move in legal_moves_set if legal_moves_set is not None else False
+            move = chess.Move(from_sq, sq)
+            # Only the side to move has legal moves.
+            is_legal = check_legal and piece.color == board.turn and board.is_legal(move)
             if legal_only and not is_legal:
                 continue
             entry = {
-                "from": chess.square_name(from_sq),
+                "from": SQUARE_NAMES[from_sq],
                 "piece": piece.symbol(),
                 "color": "white" if piece.color == chess.WHITE else "black",
                 "uci": move.uci(),
@@ -132,28 +144,51 @@ def square_analysis(
     }
 
 
-def hanging(board: chess.Board, square: str) -> bool:
+def square_analysis(
+    board: chess.Board,
+    square: str,
+    *,
+    legal_only: bool = False,
+    include_san: bool = False,
+    include_legal_flag: bool = True,
+) -> dict[str, list[dict]]:
     """
-    Indicator: True if the piece on `square` is attacked and undefended.
+    Return pieces that are attacking/protecting a target square in the current position.
 
     Args:
         board: python-chess Board instance.
-        square: Algebraic square name like "e4".
-    """
-    try:
-        target_sq = chess.parse_square(square)
-    except ValueError as exc:
-        raise ValueError(f"Invalid square '{square}'") from exc
+        square: Target square (e.g., "e4").
+        legal_only: If True, only include pieces whose move to the square is legal
+                    (filters out pinned pieces or illegal due to check/occupancy).
+        include_san: If True, include SAN strings for the move to the square (legal moves only).
+        include_legal_flag: If True, annotate each entry with an "is_legal" boolean.
 
-    piece = board.piece_at(target_sq)
-    if piece is None:
-        raise ValueError(f"No piece on square '{square}'")
+    Returns:
+        Dict with keys "white" and "black", each a list of dicts:
+        {"from", "piece", "color", "uci", (optional) "san"}.
+    """
+    return square_analysis_at(
+        board,
+        parse_square(square),
+        legal_only=legal_only,
+        include_san=include_san,
+        include_legal_flag=include_legal_flag,
+    )
+
+
+def hanging_at(board: chess.Board, sq: chess.Square) -> bool:
+    """hanging for a square index."""
+    color = require_piece(board, sq).color
+    # Pseudo-legal attackers/defenders (includes pinned pieces).
+    return bool(board.attackers_mask(not color, sq)) and not board.attackers_mask(color, sq)
 
-    color = piece.color
-    enemy = not color
 
-    # Pseudo-legal attackers/defenders (includes pinned pieces).
-    attackers = board.attackers(enemy, target_sq)
-    defenders = board.attackers(color, target_sq)
+def hanging(board: chess.Board, square: str) -> bool:
+    """
+    Indicator: True if the piece on `square` is attacked and undefended.
 
-    return len(attackers) > 0 and len(defenders) == 0
+    Args:
+        board: python-chess Board instance.
+        square: Algebraic square name like "e4".
+    """
+    return hanging_at(board, parse_square(square))
@@ -0,0 +1,271 @@
+"""
+Partitioned positions datasets: one directory per (move-number bucket, rating band).
+
+Layout (hive style, partition values live in directory names only):
+
+    positions/
+        _partitioning.json
+        move_bucket=20/rating_band=2000/part-00000.parquet
+        move_bucket=20/rating_band=none/part-00000.parquet
+        ...
+
+move_bucket is move_number rounded down to a multiple of move_bucket_size; rating_band is the
+lower of the two player ratings rounded down to a multiple of rating_band_size ("none" when the
+source has no ratings). Every file also carries the moves_to_end column of the positions table
+(moves left in the full game, recorded during replay), so trimming the end of games is a row
+predicate as well.
+
+read_partitioned prunes whole directories from the query bounds, pushes the same bounds into the
+parquet reader as row filters, and applies them exactly to whatever is read.
+"""
+
+import json
+import pathlib
+from typing import Any
+
+import pandas as pd
+
+from src.shards import is_sharded, sharded_files, write_frame
+
+SPEC_NAME = "_partitioning.json"
+NO_RATING = "none"
+
+
+def rating_floor(df: pd.DataFrame) -> pd.Series | None:
+    """Lower of the two player ratings per row (None if df has no rating columns)."""
+    if "white_rating" not in df.columns or "black_rating" not in df.columns:
+        return None
+    return df[["white_rating", "black_rating"]].min(axis=1)
+
+
+def move_buckets(move_number: pd.Series, move_bucket_size: int) -> pd.Series:
+    """move_number rounded down to a multiple of move_bucket_size."""
+    return (move_number // move_bucket_size) * move_bucket_size
+
+
+def rating_bands(rating: pd.Series | None, rating_band_size: int, index: pd.Index) -> pd.Series:
+    """Rating band labels: rating rounded down to a multiple of rating_band_size, or NO_RATING."""
+    if rating is None:
+        return pd.Series(NO_RATING, index=index)
+    return ((rating // rating_band_size) * rating_band_size).map(
+        lambda value: NO_RATING if pd.isna(value) else str(int(value))
+    )
+
+
+def write_spec(
+    output_dir: str | pathlib.Path,
+    fmt: str,
+    *,
+    move_bucket_size: int = 10,
+    rating_band_size: int = 200,
+) -> dict[str, Any]:
+    """Create the dataset directory and its partitioning spec (or check an existing one matches)."""
+    if move_bucket_size <= 0 or rating_band_size <= 0:
+        raise ValueError("move_bucket_size and rating_band_size must be positive")
+    output_dir = pathlib.Path(output_dir)
+    spec = {"format": fmt, "move_bucket_size": move_bucket_size, "rating_band_size": rating_band_size}
+
+    spec_path = output_dir / SPEC_NAME
+    if spec_path.exists():
+        existing = read_spec(output_dir)
+        if existing != spec:
+            raise ValueError(f"'{output_dir}' is partitioned as {existing}, not {spec}")
+        return spec
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with spec_path.open("w", encoding="utf-8") as handle:
+        json.dump(spec, handle, indent=2, sort_keys=True)
+    return spec
+
+
+def read_spec(dataset_dir: str | pathlib.Path) -> dict[str, Any]:
+    with (pathlib.Path(dataset_dir) / SPEC_NAME).open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def is_partitioned(path: str | pathlib.Path) -> bool:
+    return (pathlib.Path(path) / SPEC_NAME).exists()
+
+
+def write_partitioned(
+    df: pd.DataFrame,
+    output_dir: str | pathlib.Path,
+    *,
+    part: str = "00000",
+) -> list[str]:
+    """
+    Split a positions DataFrame into partition files under an existing partitioned dataset.
+
+    Args:
+        df: Positions with 'move_number' and 'moves_to_end' (ratings optional).
+        output_dir: Dataset directory previously set up with write_spec.
+        part: File stem suffix, unique per write (e.g. the shard id) so writes never collide.
+
+    Returns:
+        Written file paths relative to output_dir.
+    """
+    output_dir = pathlib.Path(output_dir)
+    spec = read_spec(output_dir)
+    fmt = spec["format"]
+    if df.empty:
+        return []
+
+    if "moves_to_end" not in df.columns:
+        # Deriving it from the rows present would be wrong once games were trimmed or sampled.
+        raise ValueError("DataFrame must include the 'moves_to_end' column recorded during replay")
+    bucket = move_buckets(df["move_number"], spec["move_bucket_size"])
+    band = rating_bands(rating_floor(df), spec["rating_band_size"], df.index)
+
+    written: list[str] = []
+    for (bucket_value, band_value), group in df.groupby([bucket, band], sort=True):
+        relative = pathlib.Path(
+            f"move_bucket={int(bucket_value)}", f"rating_band={band_value}", f"part-{part}.{fmt}"
+        )
+        write_frame(group, output_dir / relative, fmt)
+        written.append(relative.as_posix())
+    return written
+
+
+def _partition_values(path: pathlib.Path, dataset_dir: pathlib.Path) -> dict[str, str]:
+    values: dict[str, str] = {}
+    for piece in path.relative_to(dataset_dir).parts[:-1]:
+        key, _, value = piece.partition("=")
+        values[key] = value
+    return values
+
+
+def partition_files(dataset_dir: str | pathlib.Path) -> list[pathlib.Path]:
+    """
+    Data files of a partitioned dataset.
+
+    A sharded build (manifest.json present) lists its files per finished shard; files left by a
+    shard that crashed before being recorded are not data and are ignored.
+    """
+    dataset_dir = pathlib.Path(dataset_dir)
+    fmt = read_spec(dataset_dir)["format"]
+    if is_sharded(dataset_dir):
+        return sorted(path for path in sharded_files(dataset_dir) if path.suffix == f".{fmt}")
+    return sorted(dataset_dir.glob(f"move_bucket=*/rating_band=*/*.{fmt}"))
+
+
+def _keep_partition(
+    values: dict[str, str],
+    spec: dict[str, Any],
+    *,
+    min_move_number: int | None,
+    max_move_number: int | None,
+    min_rating: int | None,
+    max_rating: int | None,
+) -> bool:
+    """True if the partition can hold rows inside the requested bounds."""
+    bucket_lo = int(values["move_bucket"])
+    bucket_hi = bucket_lo + spec["move_bucket_size"] - 1
+    if min_move_number is not None and bucket_hi < min_move_number:
+        return False
+    if max_move_number is not None and bucket_lo > max_move_number:
+        return False
+
+    if min_rating is None and max_rating is None:
+        return True
+    if values["rating_band"] == NO_RATING:
+        return False
+    band_lo = int(values["rating_band"])
+    band_hi = band_lo + spec["rating_band_size"] - 1
+    # rating_band is the lower rating, so it bounds min_rating exactly and max_rating from below.
+    if min_rating is not None and band_hi < min_rating:
+        return False
+    if max_rating is not None and band_lo > max_rating:
+        return False
+    return True
+
+
+def _row_filters(
+    *,
+    min_move_number: int | None,
+    max_move_number: int | None,
+    min_rating: int | None,
+    max_rating: int | None,
+    trim_last_moves: int,
+) -> list[tuple[str, str, int]]:
+    filters: list[tuple[str, str, int]] = []
+    if min_move_number is not None:
+        filters.append(("move_number", ">=", min_move_number))
+    if max_move_number is not None:
+        filters.append(("move_number", "<=", max_move_number))
+    if min_rating is not None:
+        filters.append(("white_rating", ">=", min_rating))
+        filters.append(("black_rating", ">=", min_rating))
+    if max_rating is not None:
+        filters.append(("white_rating", "<=", max_rating))
+        filters.append(("black_rating", "<=", max_rating))
+    if trim_last_moves > 0:
+        filters.append(("moves_to_end", ">=", trim_last_moves))
+    return filters
+
+
+def read_partitioned(
+    dataset_dir: str | pathlib.Path,
+    *,
+    min_move_number: int | None = None,
+    max_move_number: int | None = None,
+    min_rating: int | None = None,
+    max_rating: int | None = None,
+    trim_last_moves: int = 0,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Read the slice of a partitioned positions dataset matching inclusive bounds.
+
+    Only partitions whose move bucket and rating band overlap the bounds are opened. For parquet
+    files the bounds are also passed to the reader as row filters (predicate pushdown); the exact
+    bounds are then applied to the rows read, for csv and parquet alike.
+
+    Args:
+        dataset_dir: Directory written by write_partitioned (of a sharded build, only the files of
+            shards recorded in its manifest are read).
+        min_move_number / max_move_number: move_number bounds.
+        min_rating / max_rating: Bounds applied to both players' ratings; positions without
+            ratings are excluded when either is given.
+        trim_last_moves: Drop the last N moves of every game (uses moves_to_end).
+        columns: Optional subset of columns to return.
+    """
+    dataset_dir = pathlib.Path(dataset_dir)
+    spec = read_spec(dataset_dir)
+    fmt = spec["format"]
+    if min_move_number is not None and max_move_number is not None and min_move_number > max_move_number:
+        raise ValueError("min_move_number cannot be greater than max_move_number")
+
+    bounds = {
+        "min_move_number": min_move_number,
+        "max_move_number": max_move_number,
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+    }
+    filters = _row_filters(**bounds, trim_last_moves=trim_last_moves)
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys(columns + [name for name, _, _ in filters]))
+
+    frames: list[pd.DataFrame] = []
+    for path in partition_files(dataset_dir):
+        if not _keep_partition(_partition_values(path, dataset_dir), spec, **bounds):
+            continue
+        if fmt == "parquet":
+            frame = pd.read_parquet(path, columns=read_columns, filters=filters or None)
+        else:
+            frame = pd.read_csv(path, usecols=read_columns)
+        frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+
+    mask = pd.Series(True, index=df.index)
+    for name, op, value in filters:
+        mask &= df[name] >= value if op == ">=" else df[name] <= value
+    df = df.loc[mask]
+    if "game_index" in df.columns and "ply" in df.columns:
+        df = df.sort_values(["game_index", "ply"], kind="stable")
+    if columns is not None:
+        df = df[columns]
+    return df.reset_index(drop=True)
@@ -0,0 +1,256 @@
+"""
+Score a positions file with a trained model, streaming it in chunks.
+
+Input is a positions file from make_dataset: a CSV or Parquet file, or a sharded / partitioned
+dataset directory (Parquet shards are read batch by batch). Features are computed per chunk
+(unless the input already has the model's feature columns) and the model predicts each chunk in
+one vectorized call. Only one chunk is held in memory at a time.
+
+The output has the position keys (game_id, game_index, ply, move_number, side_to_move, where
+present) and win_probability: the model's expected score for the side to move (draws count
+half), clipped to [0, 1].
+
+Usage:
+    PYTHONPATH=. python src/v1_regression_model.py --data data/club_positions_features.csv --model-out models/v1.joblib
+    PYTHONPATH=. python src/predict.py --model models/v1.joblib --input data/positions.parquet --output data/predictions.parquet
+    PYTHONPATH=. python src/predict.py --model models/v1.joblib --input data/positions --output data/predictions.csv --workers 4
+"""
+
+import argparse
+import os
+import pathlib
+import time
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src import partitions
+from src.evaluate_variables import evaluate_frame
+from src.shards import is_sharded, sharded_files, write_frame, write_quarantine
+from src.v1_regression_model import load_model
+
+KEY_COLS = ["game_id", "game_index", "ply", "move_number", "side_to_move"]
+PREDICTION_COL = "win_probability"
+
+
+def _input_files(path: pathlib.Path) -> list[pathlib.Path]:
+    """Files of a positions input: the file itself, or the files of a sharded/partitioned directory."""
+    if not path.is_dir():
+        return [path]
+    if is_sharded(path):
+        return sharded_files(path)
+    if partitions.is_partitioned(path):
+        return partitions.partition_files(path)
+    raise ValueError(f"'{path}' is neither a sharded nor a partitioned positions dataset")
+
+
+def iter_position_chunks(
+    path: str | pathlib.Path,
+    *,
+    chunk_rows: int = 50_000,
+    columns: Sequence[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a positions file or dataset directory as DataFrames of at most chunk_rows rows.
+
+    Args:
+        path: CSV or Parquet file, or a sharded/partitioned dataset directory.
+        chunk_rows: Maximum rows per chunk.
+        columns: If given, only these columns are read (those missing from the input are ignored).
+    """
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be positive")
+    wanted = set(columns) if columns is not None else None
+
+    for file in _input_files(pathlib.Path(path)):
+        if file.suffix.lower() == ".parquet":
+            # pyarrow is only needed for parquet input/output, so CSV-only runs work without it.
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(file)
+            read_columns = None
+            if wanted is not None:
+                read_columns = [name for name in parquet.schema_arrow.names if name in wanted]
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=read_columns):
+                yield batch.to_pandas()
+        else:
+            usecols = (lambda name: name in wanted) if wanted is not None else None
+            with pd.read_csv(file, chunksize=chunk_rows, usecols=usecols) as chunks:
+                yield from chunks
+
+
+def featurize_chunk(
+    chunk: pd.DataFrame,
+    feature_cols: Sequence[str],
+    *,
+    quarantine: list[dict] | None = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    The usable rows of a positions chunk, with feature_cols filled in.
+
+    Features are taken from the chunk if it has all of feature_cols, otherwise computed from the
+    fen/side_to_move columns (rows without a usable FEN are dropped, invalid FENs quarantined);
+    computed rows also get regression_score.
+    """
+    feature_cols = list(feature_cols)
+    if set(feature_cols) <= set(chunk.columns):
+        return chunk.dropna(subset=feature_cols).reset_index(drop=True)
+
+    computed = evaluate_frame(chunk, quarantine=quarantine, feature_names=feature_cols, workers=workers)
+    rows = chunk.loc[computed["index"]].reset_index(drop=True)
+    for col in feature_cols + ["regression_score"]:
+        rows[col] = computed[col].to_numpy()
+    return rows
+
+
+def predict_rows(model: Any, rows: pd.DataFrame, feature_cols: Sequence[str]) -> np.ndarray:
+    """win_probability for featurized rows, predicted in one call."""
+    if rows.empty:
+        return np.empty(0)
+    return np.clip(model.predict(rows[list(feature_cols)].astype(np.float64)), 0.0, 1.0)
+
+
+def score_chunk(
+    chunk: pd.DataFrame,
+    model: Any,
+    feature_cols: Sequence[str],
+    *,
+    quarantine: list[dict] | None = None,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Predict win_probability for every usable row of a positions chunk (see featurize_chunk)."""
+    rows = featurize_chunk(chunk, feature_cols, quarantine=quarantine, workers=workers)
+    out = rows[[col for col in KEY_COLS if col in rows.columns]].copy()
+    out[PREDICTION_COL] = predict_rows(model, rows, feature_cols)
+    return out
+
+
+class _PredictionWriter:
+    """Append prediction chunks to a csv or parquet file, renamed into place on close."""
+
+    def __init__(self, output_path: pathlib.Path, fmt: str) -> None:
+        if fmt not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported format '{fmt}'")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_path = output_path
+        self.tmp_path = output_path.with_name(output_path.name + ".tmp")
+        self.fmt = fmt
+        self.rows = 0
+        self._parquet: Any = None  # pyarrow.parquet.ParquetWriter, opened on the first parquet chunk
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "csv":
+            df.to_csv(self.tmp_path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.tmp_path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        if not self.tmp_path.exists():
+            # Empty input: still leave an empty predictions file behind.
+            write_frame(pd.DataFrame(columns=KEY_COLS + [PREDICTION_COL]), self.output_path, self.fmt)
+            return
+        os.replace(self.tmp_path, self.output_path)
+
+
+def predict_positions(
+    model_path: str | pathlib.Path,
+    input_path: str | pathlib.Path,
+    output_path: str | pathlib.Path,
+    *,
+    fmt: str | None = None,
+    chunk_rows: int = 50_000,
+    workers: int = 1,
+    quarantine: list[dict] | None = None,
+    progress: bool = True,
+) -> int:
+    """
+    Score every position of input_path with a saved model, writing predictions chunk by chunk.
+
+    Args:
+        model_path: Model saved by v1_regression_model.save_model.
+        input_path: Positions CSV/Parquet file or sharded/partitioned dataset directory.
+        output_path: Output csv or parquet file, written atomically.
+        fmt: Output format (inferred from the output extension if omitted).
+        chunk_rows: Positions per chunk; bounds memory use.
+        workers: Processes computing features per chunk.
+        quarantine: If given, rows with an invalid FEN are recorded here instead of raising.
+        progress: Print rows scored and throughput after every chunk.
+
+    Returns:
+        Number of rows written.
+    """
+    output_path = pathlib.Path(output_path)
+    if fmt is None:
+        fmt = "parquet" if output_path.suffix.lower() == ".parquet" else "csv"
+    model, feature_cols = load_model(model_path)
+    columns = KEY_COLS + ["fen", "result"] + list(feature_cols)
+
+    writer = _PredictionWriter(output_path, fmt)
+    started = time.perf_counter()
+    read = 0
+    for chunk in iter_position_chunks(input_path, chunk_rows=chunk_rows, columns=columns):
+        writer.write(score_chunk(chunk, model, feature_cols, quarantine=quarantine, workers=workers))
+        read += len(chunk)
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"Scored {writer.rows} of {read} rows read ({read / elapsed:,.0f} rows/s).", flush=True)
+    writer.close()
+    return writer.rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score a positions file with a trained model.")
+    parser.add_argument(
+        "--model",
+        required=True,
+        help="Model file saved with v1_regression_model --model-out.",
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        help="Positions CSV/Parquet file, or sharded/partitioned dataset directory from make_dataset.",
+    )
+    parser.add_argument("--output", required=True, help="Output predictions file (csv or parquet).")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "parquet"],
+        help="Output format (inferred from extension if omitted).",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Positions scored per chunk.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for feature computation.")
+    args = parser.parse_args()
+
+    quarantine: list[dict] = []
+    started = time.perf_counter()
+    rows = predict_positions(
+        args.model,
+        args.input,
+        args.output,
+        fmt=args.format,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        quarantine=quarantine,
+    )
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    print(f"Wrote {rows} predictions to {args.output} in {elapsed:.1f}s ({rate:,.0f} rows/s).")
+
+    if quarantine:
+        quarantine_path = f"{args.output}.quarantine.jsonl"
+        write_quarantine(quarantine, quarantine_path)
+        print(f"Quarantined {len(quarantine)} invalid rows to {quarantine_path}.")
+
+
+if __name__ == "__main__":
+    main()
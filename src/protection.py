@@ -1,24 +1,59 @@
 """
 Utilities to list legal attackers and defenders for a given occupied square.
+
+The string functions take an algebraic square name; the _at forms take a square index, and
+attacker_squares / defender_squares return bare square indices for counting in feature loops.
 """
 
 import chess
 
 from src import move_utils
+from src.squares import parse_square
+
+
+def attacker_squares(board: chess.Board, sq: chess.Square) -> list[chess.Square]:
+    """Squares of the opposing pieces that can legally capture the piece on sq."""
+    piece = move_utils.require_piece(board, sq)
+    return move_utils.legal_attackers_at(board, not piece.color, sq)
+
+
+def defender_squares(board: chess.Board, sq: chess.Square) -> list[chess.Square]:
+    """Squares of the same-color pieces that could legally recapture on sq (see square_defenders)."""
+    piece = move_utils.require_piece(board, sq)
+    if piece.color != board.turn:
+        # Only the side to move has legal moves.
+        return []
+    temp_board = board.copy(stack=False)
+    temp_board.remove_piece_at(sq)
+    return move_utils.legal_attackers_at(temp_board, piece.color, sq)
 
 
-def _validate_piece_on_square(board: chess.Board, square: str) -> tuple[int, chess.Piece]:
-    """Parse square and ensure a piece is present."""
-    try:
-        sq = chess.parse_square(square)
-    except ValueError as exc:
-        raise ValueError(f"Invalid square '{square}'") from exc
+def square_attackers_at(board: chess.Board, sq: chess.Square, *, include_san: bool = False) -> list[dict]:
+    """square_attackers for a square index."""
+    piece = move_utils.require_piece(board, sq)
+    analysis = move_utils.square_analysis_at(
+        board,
+        sq,
+        legal_only=True,
+        include_san=include_san,
+        include_legal_flag=False,
+    )
+    return analysis["black"] if piece.color == chess.WHITE else analysis["white"]
 
-    piece = board.piece_at(sq)
-    if piece is None:
-        raise ValueError(f"No piece on square '{square}'")
 
-    return sq, piece
+def square_defenders_at(board: chess.Board, sq: chess.Square, *, include_san: bool = False) -> list[dict]:
+    """square_defenders for a square index."""
+    piece = move_utils.require_piece(board, sq)
+    temp_board = board.copy(stack=False)
+    temp_board.remove_piece_at(sq)
+    analysis = move_utils.square_analysis_at(
+        temp_board,
+        sq,
+        legal_only=True,
+        include_san=include_san,
+        include_legal_flag=False,
+    )
+    return analysis["white"] if piece.color == chess.WHITE else analysis["black"]
 
 
 def square_attackers(
@@ -35,17 +70,7 @@ def square_attackers(
         square: Algebraic square name of the piece to evaluate (e.g., "e4").
         include_san: If True, include SAN strings for the capture move.
     """
-    _, piece = _validate_piece_on_square(board, square)
-
-    analysis = move_utils.square_analysis(
-        board,
-        square,
-        legal_only=True,
-        include_san=include_san,
-        include_legal_flag=False,
-    )
-
-    return analysis["black"] if piece.color == chess.WHITE else analysis["white"]
+    return square_attackers_at(board, parse_square(square), include_san=include_san)
 
 
 def square_defenders(
@@ -64,17 +89,4 @@ def square_defenders(
         square: Algebraic square name of the piece to evaluate (e.g., "e4").
         include_san: If True, include SAN strings for the recapture move.
     """
-    sq, piece = _validate_piece_on_square(board, square)
-
-    temp_board = board.copy(stack=False)
-    temp_board.remove_piece_at(sq)
-
-    analysis = move_utils.square_analysis(
-        temp_board,
-        square,
-        legal_only=True,
-        include_san=include_san,
-        include_legal_flag=False,
-    )
-
-    return analysis["white"] if piece.color == chess.WHITE else analysis["black"]
+    return square_defenders_at(board, parse_square(square), include_san=include_san)
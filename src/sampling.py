@@ -0,0 +1,83 @@
+"""
+Per-game position sampling applied while games are replayed.
+
+Consecutive plies of one game are highly correlated, so keeping every ply of a long game mostly
+adds cost. A PlySampler picks, before a game is replayed, which plies become position rows; the
+loaders then skip SAN/FEN generation for every other ply and stop replaying after the last
+selected one. Choices depend only on (seed, game_index), so runs are reproducible and a resumed
+or re-sharded build selects the same positions.
+
+The loaders still learn each game's full length before sampling: every sampled row carries
+moves_to_end measured from the real end of the game, not from the last sampled ply, so trimming
+a sampled dataset afterwards (partitioned reads, _trim_last_moves) counts from the true end.
+"""
+
+import random
+
+
+class PlySampler:
+    """
+    Choose the plies of a game to keep, using exactly one of three modes.
+
+    Args:
+        per_game: Keep k plies per game, chosen uniformly.
+        every: Keep every n-th ply, from a random offset per game (so sides alternate when n is even).
+        per_bucket: Keep k plies from each move-number bucket of bucket_size moves (stratified).
+        bucket_size: Bucket width in moves for per_bucket.
+        seed: Base seed; each game draws from its own generator seeded with (seed, game_index).
+        trim_last_moves: Exclude the last N moves of each game before sampling (the sampled
+            equivalent of make_dataset's --trim-last-moves).
+    """
+
+    __slots__ = ("per_game", "every", "per_bucket", "bucket_size", "seed", "trim_last_moves")
+
+    def __init__(
+        self,
+        *,
+        per_game: int | None = None,
+        every: int | None = None,
+        per_bucket: int | None = None,
+        bucket_size: int = 10,
+        seed: int = 0,
+        trim_last_moves: int = 0,
+    ) -> None:
+        modes = [value for value in (per_game, every, per_bucket) if value is not None]
+        if len(modes) != 1:
+            raise ValueError("Choose exactly one of per_game, every or per_bucket")
+        if modes[0] <= 0 or bucket_size <= 0:
+            raise ValueError("Sampling sizes must be positive")
+        self.per_game = per_game
+        self.every = every
+        self.per_bucket = per_bucket
+        self.bucket_size = bucket_size
+        self.seed = seed
+        self.trim_last_moves = max(trim_last_moves, 0)
+
+    def settings(self) -> dict[str, int | None]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def select(self, game_index: int, n_plies: int, *, min_move_number: int = 1) -> list[int]:
+        """
+        Sorted plies (1-based) to keep from a game of n_plies plies.
+
+        Only plies with move_number >= min_move_number and outside the trimmed final moves are
+        eligible.
+        """
+        last_move = (n_plies + 1) // 2 - self.trim_last_moves
+        eligible = [ply for ply in range(1, n_plies + 1) if min_move_number <= (ply + 1) // 2 <= last_move]
+        if not eligible:
+            return []
+
+        rng = random.Random(f"{self.seed}:{game_index}")
+        if self.every is not None:
+            return eligible[rng.randrange(min(self.every, len(eligible))) :: self.every]
+        if self.per_game is not None:
+            return sorted(rng.sample(eligible, min(self.per_game, len(eligible))))
+
+        buckets: dict[int, list[int]] = {}
+        for ply in eligible:
+            buckets.setdefault((ply + 1) // 2 // self.bucket_size, []).append(ply)
+        chosen: list[int] = []
+        for plies in buckets.values():
+            chosen.extend(rng.sample(plies, min(self.per_bucket, len(plies))))
+        return sorted(chosen)
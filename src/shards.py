@@ -0,0 +1,267 @@
+"""
+Sharded, resumable output for long dataset builds.
+
+A sharded build writes its rows into numbered shard files inside an output directory,
+alongside a manifest.json recording which shards (and which input games/rows) are finished
+and a quarantine.jsonl listing inputs that could not be processed. Rerunning with resume
+skips every shard already recorded in the manifest. Incremental (append) builds also keep the
+keys of the games in each shard under ingested/, so later runs can skip games already ingested.
+"""
+
+import json
+import os
+import pathlib
+import uuid
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+MANIFEST_NAME = "manifest.json"
+QUARANTINE_NAME = "quarantine.jsonl"
+KEYS_DIR = "ingested"
+
+
+def shard_name(shard_id: int) -> str:
+    """Zero-padded shard key used for file names and manifest entries."""
+    return f"{shard_id:05d}"
+
+
+def write_frame(df: pd.DataFrame, output_path: str | pathlib.Path, fmt: str) -> None:
+    """
+    Write a DataFrame atomically (temp file + rename) as csv or parquet.
+
+    The temp file name is unique per call, so concurrent writers of the same output (e.g. two
+    workqueue workers finishing the same unit) never write into each other's file.
+    """
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported format '{fmt}'")
+    output_path = pathlib.Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f"{output_path.name}.{uuid.uuid4().hex}.tmp")
+
+    try:
+        if fmt == "csv":
+            df.to_csv(tmp_path, index=False)
+        else:
+            df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_quarantine(items: Iterable[dict], path: str | pathlib.Path, *, append: bool = False) -> None:
+    """Write quarantined inputs as JSON lines (QUARANTINE_NAME in sharded outputs)."""
+    with pathlib.Path(path).open("a" if append else "w", encoding="utf-8") as handle:
+        for item in items:
+            handle.write(json.dumps(item, default=str) + "\n")
+
+
+def read_frame(path: str | pathlib.Path) -> pd.DataFrame:
+    """Read a csv or parquet file, chosen by extension."""
+    path = pathlib.Path(path)
+    if path.suffix.lower() == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class ShardManifest:
+    """
+    Record of finished shards for one output directory.
+
+    The manifest stores the build settings (so a resume with different settings is refused)
+    and one entry per finished shard, e.g. {"file": "shard-00003.csv", "rows": 1200,
+    "first_game": 1501, "last_game": 2000, "quarantined": 1}.
+    """
+
+    def __init__(self, directory: str | pathlib.Path, settings: dict[str, Any]) -> None:
+        self.directory = pathlib.Path(directory)
+        self.settings = settings
+        self.shards: dict[str, dict[str, Any]] = {}
+        self.complete = False
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self.directory / MANIFEST_NAME
+
+    @classmethod
+    def open(
+        cls,
+        directory: str | pathlib.Path,
+        settings: dict[str, Any],
+        *,
+        resume: bool = False,
+    ) -> "ShardManifest":
+        """
+        Create a manifest for a new build, or load the existing one when resuming.
+
+        Raises:
+            ValueError: if the directory already holds a build and resume is False, or if
+                the stored settings differ from the requested ones.
+        """
+        manifest = cls(directory, settings)
+        if not manifest.path.exists():
+            manifest.directory.mkdir(parents=True, exist_ok=True)
+            manifest.save()
+            return manifest
+
+        if not resume:
+            raise ValueError(
+                f"'{manifest.directory}' already contains a sharded build; pass resume=True to continue it"
+            )
+
+        with manifest.path.open("r", encoding="utf-8") as handle:
+            stored = json.load(handle)
+        if stored.get("settings") != settings:
+            raise ValueError(
+                f"Cannot resume '{manifest.directory}': build settings differ "
+                f"(stored {stored.get('settings')}, requested {settings})"
+            )
+        manifest.shards = stored.get("shards", {})
+        manifest.complete = stored.get("complete", False)
+        manifest._drop_orphan_quarantine()
+        return manifest
+
+    def is_done(self, shard_id: int) -> bool:
+        return shard_name(shard_id) in self.shards
+
+    def shard_path(self, shard_id: int, fmt: str) -> pathlib.Path:
+        return self.directory / f"shard-{shard_name(shard_id)}.{fmt}"
+
+    def commit(
+        self,
+        shard_id: int,
+        df: pd.DataFrame,
+        fmt: str,
+        *,
+        quarantined: list[dict] | None = None,
+        writer: Callable[[pd.DataFrame, str], list[str]] | None = None,
+        keys: Iterable[str] | None = None,
+        **info: Any,
+    ) -> None:
+        """
+        Write a finished shard, its quarantined inputs, then record it in the manifest.
+
+        By default the shard is one file, shard-<id>.<fmt>. A writer(df, shard_key) may instead
+        lay the rows out itself and return the written paths relative to the directory.
+        keys (e.g. the ids of the games in the shard) are written to ingested/keys-<id>.txt and
+        returned by ingested_keys once the shard is recorded.
+
+        The manifest is updated last, so a crash at any point leaves the shard unrecorded
+        and it is simply rebuilt on resume.
+        """
+        key = shard_name(shard_id)
+        entry: dict[str, Any] = {"file": None, "rows": int(len(df))}
+        if not df.empty:
+            if writer is not None:
+                entry["files"] = writer(df, key)
+            else:
+                path = self.shard_path(shard_id, fmt)
+                write_frame(df, path, fmt)
+                entry["file"] = path.name
+
+        entry["quarantined"] = self._append_quarantine(key, quarantined)
+        if keys is not None:
+            entry["keys"] = self._write_keys(key, keys)
+        entry.update(info)
+
+        self.shards[key] = entry
+        self.save()
+
+    def adopt(
+        self,
+        shard_id: int,
+        path: str | pathlib.Path,
+        fmt: str,
+        *,
+        rows: int,
+        quarantined: list[dict] | None = None,
+        **info: Any,
+    ) -> None:
+        """Record an already written shard file, moving it into the directory (same filesystem)."""
+        key = shard_name(shard_id)
+        target = self.shard_path(shard_id, fmt)
+        os.replace(path, target)
+        count = self._append_quarantine(key, quarantined)
+        self.shards[key] = {"file": target.name, "rows": rows, "quarantined": count, **info}
+        self.save()
+
+    def _append_quarantine(self, key: str, quarantined: list[dict] | None) -> int:
+        if quarantined:
+            items = ({"shard": key, **item} for item in quarantined)
+            write_quarantine(items, self.directory / QUARANTINE_NAME, append=True)
+        return len(quarantined or [])
+
+    def finish(self) -> None:
+        self.complete = True
+        self.save()
+
+    def save(self) -> None:
+        payload = {"settings": self.settings, "complete": self.complete, "shards": self.shards}
+        tmp_path = self.path.with_name(MANIFEST_NAME + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, indent=2, sort_keys=True, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _write_keys(self, key: str, keys: Iterable[str]) -> str:
+        relative = pathlib.Path(KEYS_DIR, f"keys-{key}.txt")
+        path = self.directory / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.writelines(f"{item}\n" for item in keys)
+        os.replace(tmp_path, path)
+        return relative.as_posix()
+
+    def ingested_keys(self) -> set[str]:
+        """Union of the keys of all recorded shards (key files of unrecorded shards are ignored)."""
+        keys: set[str] = set()
+        for entry in self.shards.values():
+            if entry.get("keys"):
+                with (self.directory / entry["keys"]).open("r", encoding="utf-8") as handle:
+                    keys.update(line.rstrip("\n") for line in handle)
+        return keys
+
+    def _drop_orphan_quarantine(self) -> None:
+        """Remove quarantine lines written by a shard that crashed before being recorded."""
+        path = self.directory / QUARANTINE_NAME
+        if not path.exists():
+            return
+        with path.open("r", encoding="utf-8") as handle:
+            lines = [line for line in handle if line.strip()]
+        kept = [line for line in lines if json.loads(line).get("shard") in self.shards]
+        if len(kept) != len(lines):
+            with path.open("w", encoding="utf-8") as handle:
+                handle.writelines(kept)
+
+    @property
+    def rows(self) -> int:
+        return sum(entry["rows"] for entry in self.shards.values())
+
+    @property
+    def quarantined(self) -> int:
+        return sum(entry.get("quarantined", 0) for entry in self.shards.values())
+
+
+def is_sharded(path: str | pathlib.Path) -> bool:
+    return (pathlib.Path(path) / MANIFEST_NAME).exists()
+
+
+def sharded_files(directory: str | pathlib.Path) -> list[pathlib.Path]:
+    """Files of all finished shards of a sharded output directory, in shard order."""
+    directory = pathlib.Path(directory)
+    with (directory / MANIFEST_NAME).open("r", encoding="utf-8") as handle:
+        stored = json.load(handle)
+
+    return [
+        directory / name
+        for _, entry in sorted(stored.get("shards", {}).items())
+        for name in entry.get("files", [entry["file"]] if entry.get("file") else [])
+    ]
+
+
+def read_sharded(directory: str | pathlib.Path) -> pd.DataFrame:
+    """Concatenate all finished shards of a sharded output directory, in shard order."""
+    frames = [read_frame(path) for path in sharded_files(directory)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
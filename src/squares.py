@@ -0,0 +1,42 @@
+"""
+Integer-square helpers and per-square lookup tables, computed once at import.
+
+Squares are python-chess square indices (a1 = 0 ... h8 = 63) and sets of squares are bitboards.
+The string-based functions of move_utils and protection parse their square argument once with
+parse_square and then work on indices only; feature code calls the index-based layer directly.
+
+Tables:
+    KNIGHT_ATTACKS[sq], KING_ATTACKS[sq], PAWN_ATTACKS[color][sq]: attack bitboards (the
+        python-chess tables).
+    LINE[a][b]: the full rank/file/diagonal through a and b (both included), 0 if not aligned.
+    BETWEEN[a][b]: squares strictly between a and b on their line, 0 if not aligned.
+    CENTRALITY[sq]: centrality weight (2 core, 1 ring and corners, 0 elsewhere).
+"""
+
+import chess
+
+SQUARE_NAMES = tuple(chess.SQUARE_NAMES)
+_SQUARE_INDEX = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+
+
+def parse_square(name: str) -> chess.Square:
+    """Square index of an algebraic name like "e4"; raises ValueError for anything else."""
+    try:
+        return _SQUARE_INDEX[name]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid square '{name}'") from None
+
+
+# Attack tables are python-chess's own; LINE and BETWEEN tabulate chess.ray / chess.between.
+KNIGHT_ATTACKS = chess.BB_KNIGHT_ATTACKS
+KING_ATTACKS = chess.BB_KING_ATTACKS
+PAWN_ATTACKS = chess.BB_PAWN_ATTACKS
+LINE = tuple(tuple(chess.ray(a, b) for b in chess.SQUARES) for a in chess.SQUARES)
+BETWEEN = tuple(tuple(chess.between(a, b) for b in chess.SQUARES) for a in chess.SQUARES)
+
+_CENTER_CORE = frozenset({chess.D4, chess.E4, chess.D5, chess.E5})
+_CENTER_RING = frozenset({chess.C4, chess.F4, chess.C5, chess.F5, chess.D3, chess.E3, chess.D6, chess.E6})
+_CENTER_CORNERS = frozenset({chess.C3, chess.F3, chess.C6, chess.F6})
+_CENTRAL_SQUARES = _CENTER_CORE | _CENTER_RING | _CENTER_CORNERS
+CENTRALITY = tuple(2 if sq in _CENTER_CORE else 1 if sq in _CENTRAL_SQUARES else 0 for sq in chess.SQUARES)
+BB_CENTRAL = sum(chess.BB_SQUARES[sq] for sq in _CENTRAL_SQUARES)
@@ -0,0 +1,78 @@
+"""
+End-to-end PGN loading throughput: plain input vs compressed input, with and without the
+background decompression thread.
+
+Compressed copies of the input are written to a temporary directory first (.gz, .bz2, .xz and,
+if zstandard is installed, .zst).
+
+Usage:
+    PYTHONPATH=. python src/tests/bench_compressed.py --pgn data/games.pgn --max-games 2000
+"""
+
+import argparse
+import bz2
+import gzip
+import lzma
+import pathlib
+import shutil
+import tempfile
+import time
+
+from src import compressed
+from src.columns import ColumnBuilder
+from src.make_dataset import PGN_SCHEMA, _collect_positions, _pgn_games
+
+
+def write_compressed(source: pathlib.Path, directory: pathlib.Path) -> list[pathlib.Path]:
+    data = source.read_bytes()
+    paths = []
+    for suffix, compress in ((".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)):
+        path = directory / (source.name + suffix)
+        path.write_bytes(compress(data))
+        paths.append(path)
+    try:
+        import zstandard
+    except ImportError:
+        return paths
+    path = directory / (source.name + ".zst")
+    path.write_bytes(zstandard.ZstdCompressor(level=10).compress(data))
+    paths.append(path)
+    return paths
+
+
+def timed_load(path: pathlib.Path, max_games: int | None, *, threaded: bool = True) -> tuple[float, int]:
+    """Replay the PGN as load_pgn_positions does, choosing whether decompression is threaded."""
+    started = time.perf_counter()
+    with compressed.open_text(path, threaded=threaded) as handle:
+        games = _pgn_games(handle, max_games=max_games)
+        columns = _collect_positions(games, ColumnBuilder(PGN_SCHEMA), [])
+    return time.perf_counter() - started, len(columns)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark loading compressed PGN input.")
+    parser.add_argument("--pgn", required=True, help="Plain PGN file to compress and load.")
+    parser.add_argument("--max-games", type=int, default=None, help="Optional limit on games to load.")
+    args = parser.parse_args()
+
+    source = pathlib.Path(args.pgn)
+    directory = pathlib.Path(tempfile.mkdtemp(prefix="bench-compressed-"))
+    try:
+        paths = write_compressed(source, directory)
+        seconds, rows = timed_load(source, args.max_games)
+        size = source.stat().st_size
+        print(f"{'plain':>6}: {seconds:6.2f}s  {rows / seconds:9,.0f} positions/s  ({size:,} bytes)")
+        for path in paths:
+            size = path.stat().st_size
+            inline, _ = timed_load(path, args.max_games, threaded=False)
+            threaded, _ = timed_load(path, args.max_games, threaded=True)
+            print(
+                f"{path.suffix:>6}: {threaded:6.2f}s  {rows / threaded:9,.0f} positions/s  ({size:,} bytes; "
+                f"{inline:.2f}s decompressing in the reading thread)"
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
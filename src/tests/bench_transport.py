@@ -0,0 +1,96 @@
+"""
+Compare returning worker results by pickling DataFrames with the shared-buffer transport.
+
+Workers build synthetic position+feature rows (cheap to generate, so result transport dominates)
+and the parent assembles one DataFrame, either from pickled per-unit frames (Pool.map + concat)
+or through src.transport.run_columnar.
+
+Usage:
+    PYTHONPATH=. python src/tests/bench_transport.py --rows 2000000 --workers 4
+"""
+
+import argparse
+import functools
+import multiprocessing
+import random
+import time
+
+import pandas as pd
+
+from src.columns import CATEGORY, FLOAT, INT, STR, ColumnBuilder
+from src.transport import run_columnar
+
+SCHEMA = [
+    ("game_index", INT),
+    ("ply", INT),
+    ("side_to_move", CATEGORY),
+    ("fen", STR),
+    ("san", CATEGORY),
+    ("connection", INT),
+    ("mobility", INT),
+    ("centrality", INT),
+    ("regression_score", FLOAT),
+]
+FEN = "r1bq1rk1/pp1n1ppp/2p1pn2/2Pp4/3P1B2/2N1PN2/PP3PPP/R2Q1RK1 b - - 2 {}"
+SANS = ["e4", "Nf3", "Bb5", "O-O", "Qxd8+", "exd5", "Rfe1", "h3"]
+
+
+def synthetic_unit(unit: tuple[int, int]) -> tuple[ColumnBuilder, list[dict]]:
+    start, n_rows = unit
+    rng = random.Random(start)
+    columns = ColumnBuilder(SCHEMA)
+    for row in range(start, start + n_rows):
+        columns.append(
+            row // 80,
+            row % 80 + 1,
+            "white" if row % 2 else "black",
+            FEN.format(row),  # distinct strings, as real FENs are
+            SANS[row % len(SANS)],
+            rng.randrange(40),
+            rng.randrange(120),
+            rng.randrange(60),
+            rng.random(),
+        )
+    return columns, []
+
+
+def pickled_unit(unit: tuple[int, int]) -> pd.DataFrame:
+    return synthetic_unit(unit)[0].to_frame()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark result transport between processes.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Total rows produced by the workers.")
+    parser.add_argument("--unit-rows", type=int, default=50_000, help="Rows per work unit.")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes.")
+    args = parser.parse_args()
+
+    units = [
+        (start, min(args.unit_rows, args.rows - start)) for start in range(0, args.rows, args.unit_rows)
+    ]
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        frames = pool.map(pickled_unit, units)
+    pickled = pd.concat(frames, ignore_index=True)
+    pickle_seconds = time.perf_counter() - started
+    del frames
+
+    started = time.perf_counter()
+    shared, _ = run_columnar(functools.partial(synthetic_unit), units, SCHEMA, workers=args.workers)
+    shared_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for unit in units:
+        synthetic_unit(unit)
+    build_seconds = time.perf_counter() - started
+
+    assert len(pickled) == len(shared) == args.rows
+    print(f"{args.rows} rows, {len(units)} units, {args.workers} workers")
+    print(f"  building rows only (1 process): {build_seconds:7.2f}s")
+    print(f"  pickled frames + concat:        {pickle_seconds:7.2f}s")
+    print(f"  shared buffers:                 {shared_seconds:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
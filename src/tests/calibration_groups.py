@@ -0,0 +1,49 @@
+"""
+Check CalibrationReport's per-bucket and per-band sums against a plain per-row loop, including
+chunks where every move_number falls in bucket 0 (the whole move_bucket=0 partition of a
+partitioned dataset arrives as one such chunk).
+
+Run with:
+    PYTHONPATH=. python src/tests/calibration_groups.py
+"""
+
+import numpy as np
+
+from src.calibration import CalibrationReport
+
+
+def expected_rows(keys: list) -> dict:
+    counts: dict = {}
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    chunks = [
+        (np.array([1, 2, 3, 4, 5]), np.array([1500.0, np.nan, 1650.0, 1500.0, 2210.0])),  # bucket 0 only
+        (np.array([3, 9]), np.array([np.nan, np.nan])),
+        (np.arange(1, 60), rng.integers(900, 2600, 59).astype(np.float64)),
+    ]
+
+    report = CalibrationReport(move_bucket_size=10, rating_band_size=200)
+    buckets: list[int] = []
+    bands: list[str] = []
+    for move_number, rating in chunks:
+        predicted = rng.random(len(move_number))
+        outcome = rng.choice([0.0, 0.5, 1.0], len(move_number))
+        report.update(predicted, outcome, move_number=move_number, rating=rating)
+        buckets.extend(int(move) // 10 * 10 for move in move_number)
+        bands.extend("none" if np.isnan(value) else str(int(value) // 200 * 200) for value in rating)
+
+    got_buckets = {key: int(sums[0]) for key, sums in report.by_move_bucket.items()}
+    got_bands = {key: int(sums[0]) for key, sums in report.by_rating_band.items()}
+    assert got_buckets == expected_rows(buckets), got_buckets
+    assert got_bands == expected_rows(bands), got_bands
+    assert sum(got_buckets.values()) == int(report.totals[0])
+    print(f"OK: {len(got_buckets)} move buckets, {len(got_bands)} rating bands.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Shared-memory result transport for multi-process stages (feature extraction, game replay).
+
+Instead of pickling DataFrames back to the parent, workers write their rows into one set of
+pre-allocated, fixed-dtype column buffers: memory-mapped files in /dev/shm (RAM-backed shared
+memory) when it has room, otherwise in the temp directory. A run has two phases:
+
+  1. Each worker processes units (e.g. a block of games or input rows) into a local
+     ColumnBuilder and reports only the unit's row count, the distinct values of its
+     categorical columns and its widest string.
+  2. The parent sizes one buffer per column for the whole table, gives every unit its row offset
+     and a code mapping into the merged categories, and the workers copy their rows into their
+     slice of the buffers.
+
+The parent then wraps the buffers as the final DataFrame: INT, FLOAT and CATEGORY columns are
+views of the shared buffers (categorical codes are stored in the dtype pandas uses for them), so
+assembly copies nothing. STR columns are stored as fixed-width UTF-8 bytes and decoded once into
+Python strings, which pandas needs anyway.
+"""
+
+import json
+import multiprocessing
+import os
+import pathlib
+import queue
+import shutil
+import tempfile
+import traceback
+from typing import Any, Callable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.columns import CATEGORY, FLOAT, INT, STR, ColumnBuilder
+
+# fn(unit) -> (rows of the unit, quarantined inputs of the unit); must be picklable.
+UnitFunction = Callable[[Any], tuple[ColumnBuilder, list[dict]]]
+
+STORE_NAME = "_store.json"
+_NUMERIC_DTYPES = {INT: np.int64, FLOAT: np.float64}
+_POLL_SECONDS = 1.0
+
+
+def buffer_dir(nbytes: int = 0) -> str:
+    """Directory for shared buffers: /dev/shm when it is writable and has nbytes free, else temp."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK) and shutil.disk_usage(shm).free > 2 * nbytes:
+        return shm
+    return tempfile.gettempdir()
+
+
+def _code_dtype(n_categories: int) -> np.dtype:
+    """Smallest code dtype pandas uses for n categories (so Categorical.from_codes does not copy)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class ColumnStore:
+    """
+    Fixed-dtype columns of n_rows rows, one memory-mapped file per column in a directory.
+
+    Any process can attach to the directory and write disjoint row slices concurrently.
+
+    Example:
+        store = ColumnStore.create(directory, 1000, {"ply": "int64", "fen": "S90"})
+        ColumnStore.attach(directory)["ply"][0:10] = ...   # in a worker
+    """
+
+    __slots__ = ("directory", "n_rows", "dtypes", "_arrays")
+
+    def __init__(self, directory: str | pathlib.Path, n_rows: int, dtypes: dict[str, str], mode: str) -> None:
+        self.directory = pathlib.Path(directory)
+        self.n_rows = n_rows
+        self.dtypes = dtypes
+        self._arrays: dict[str, np.ndarray] = {}
+        for index, (name, dtype) in enumerate(dtypes.items()):
+            if n_rows == 0:
+                self._arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                path = self.directory / f"column-{index:03d}.bin"
+                self._arrays[name] = np.memmap(path, dtype=dtype, mode=mode, shape=(n_rows,))
+
+    @classmethod
+    def create(cls, directory: str | pathlib.Path, n_rows: int, dtypes: dict[str, str]) -> "ColumnStore":
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with (directory / STORE_NAME).open("w", encoding="utf-8") as handle:
+            json.dump({"rows": n_rows, "dtypes": dtypes}, handle)
+        return cls(directory, n_rows, dtypes, "w+")
+
+    @classmethod
+    def attach(cls, directory: str | pathlib.Path) -> "ColumnStore":
+        with (pathlib.Path(directory) / STORE_NAME).open("r", encoding="utf-8") as handle:
+            stored = json.load(handle)
+        return cls(directory, stored["rows"], stored["dtypes"], "r+")
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def release(self) -> None:
+        """Delete the backing files; arrays already mapped (e.g. by a DataFrame) stay valid."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# (name, kind, values as NumPy, distinct values of a CATEGORY column) per column of a unit.
+_Prepared = list[tuple[str, str, np.ndarray, list[Any] | None]]
+
+
+def _encode(values: list[Any]) -> np.ndarray:
+    """Fixed-width UTF-8 bytes for a STR column (missing values become empty strings)."""
+    if None not in values:
+        try:
+            return np.array(values, dtype=bytes)  # fast path for ASCII text such as FENs
+        except UnicodeEncodeError:
+            pass
+    encoded = [value.encode("utf-8") if isinstance(value, str) else b"" for value in values]
+    return np.array(encoded, dtype=bytes)
+
+
+def _prepare(columns: ColumnBuilder) -> _Prepared:
+    prepared: _Prepared = []
+    for name, kind, buffer, values in columns.buffers():
+        array = _encode(buffer) if kind == STR else np.asarray(buffer)
+        prepared.append((name, kind, array, values))
+    return prepared
+
+
+def _summary(prepared: _Prepared) -> tuple[int, dict[str, list[Any]], dict[str, int]]:
+    """(rows, distinct values per CATEGORY column, widest encoded value per STR column)."""
+    categories = {name: values for name, kind, _, values in prepared if kind == CATEGORY}
+    widths = {name: array.itemsize for name, kind, array, _ in prepared if kind == STR}
+    return len(prepared[0][2]), categories, widths
+
+
+def _write_unit(store: ColumnStore, prepared: _Prepared, offset: int, remaps: dict[str, np.ndarray]) -> None:
+    """Copy one unit's rows into rows [offset, offset + rows) of the store."""
+    for name, kind, array, _ in prepared:
+        target = store[name][offset : offset + len(array)]
+        if kind == CATEGORY:
+            # The last slot of each remap table maps missing (-1) codes to -1.
+            target[:] = remaps[name][array]
+        else:
+            target[:] = array
+
+
+def _worker(fn: UnitFunction, tasks: Any, reports: Any, conn: Any, worker_id: int) -> None:
+    held: dict[int, _Prepared] = {}
+    try:
+        for unit_id, unit in iter(tasks.get, None):
+            columns, quarantined = fn(unit)
+            held[unit_id] = _prepare(columns)
+            reports.put(("unit", worker_id, unit_id, _summary(held[unit_id]), quarantined))
+        reports.put(("done", worker_id))
+
+        directory, placements = conn.recv()
+        if directory is None:
+            return
+        store = ColumnStore.attach(directory)
+        for unit_id, prepared in held.items():
+            offset, remaps = placements[unit_id]
+            _write_unit(store, prepared, offset, remaps)
+        conn.send(None)
+    except BaseException:
+        message = traceback.format_exc()
+        reports.put(("error", worker_id, message))
+        try:
+            conn.send(message)
+        except (BrokenPipeError, OSError):
+            pass
+
+
+def _collect_reports(reports: Any, processes: list[Any], workers: int) -> list[tuple]:
+    """Wait until every worker finished phase 1; raise if one failed or died."""
+    messages: list[tuple] = []
+    finished = 0
+    while finished < workers:
+        try:
+            message = reports.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            dead = [process for process in processes if process.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError(f"Worker process exited with code {dead[0].exitcode}")
+            continue
+        if message[0] == "error":
+            raise RuntimeError(f"Worker {message[1]} failed:\n{message[2]}")
+        if message[0] == "done":
+            finished += 1
+        else:
+            messages.append(message)
+    return messages
+
+
+def _to_frame(
+    store: ColumnStore,
+    schema: Sequence[tuple[str, str]],
+    categories: dict[str, list[Any]],
+) -> pd.DataFrame:
+    data: dict[str, Any] = {}
+    for name, kind in schema:
+        buffer = np.asarray(store[name])
+        if kind == CATEGORY:
+            index = pd.Index(categories[name], dtype=object)
+            data[name] = pd.Categorical.from_codes(buffer, categories=index)
+        elif kind == STR:
+            data[name] = pd.Series([value.decode("utf-8") for value in buffer.tolist()], dtype=object)
+        else:
+            data[name] = buffer
+    return pd.DataFrame(data, copy=False)
+
+
+def run_columnar(
+    fn: UnitFunction,
+    units: Sequence[Any],
+    schema: Sequence[tuple[str, str]],
+    *,
+    workers: int,
+    directory: str | pathlib.Path | None = None,
+) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    Run fn over units in worker processes and assemble their rows through shared buffers.
+
+    Args:
+        fn: fn(unit) -> (ColumnBuilder with the given schema, quarantined inputs); module-level
+            function (or functools.partial of one) so it can be sent to workers.
+        units: Work items; rows appear in the output in unit order.
+        schema: ColumnBuilder schema of the rows fn returns.
+        workers: Number of worker processes.
+        directory: Parent directory for the shared buffers (default: buffer_dir()).
+
+    Returns:
+        The assembled DataFrame and the quarantined inputs of all units, in unit order.
+    """
+    if workers <= 0:
+        raise ValueError("workers must be positive")
+    workers = max(1, min(workers, len(units)))
+
+    context = multiprocessing.get_context()
+    tasks = context.Queue()
+    reports = context.Queue()
+    for item in enumerate(units):
+        tasks.put(item)
+    for _ in range(workers):
+        tasks.put(None)
+
+    pipes = [context.Pipe() for _ in range(workers)]
+    processes = [
+        context.Process(target=_worker, args=(fn, tasks, reports, child, worker_id), daemon=True)
+        for worker_id, (_, child) in enumerate(pipes)
+    ]
+    for process in processes:
+        process.start()
+
+    store: ColumnStore | None = None
+    try:
+        messages = sorted(_collect_reports(reports, processes, workers), key=lambda message: message[2])
+
+        # Merge categories in unit order and give each unit its row offset and code remaps.
+        merged: dict[str, dict[Any, int]] = {name: {} for name, kind in schema if kind == CATEGORY}
+        widths: dict[str, int] = {name: 1 for name, kind in schema if kind == STR}
+        placements: list[dict[int, tuple[int, dict[str, np.ndarray]]]] = [{} for _ in range(workers)]
+        quarantined: list[dict] = []
+        n_rows = 0
+        for _, worker_id, unit_id, (rows, categories, unit_widths), unit_quarantine in messages:
+            remaps: dict[str, list[int]] = {}
+            for name, values in categories.items():
+                lookup = merged[name]
+                remaps[name] = [lookup.setdefault(value, len(lookup)) for value in values] + [-1]
+            for name, width in unit_widths.items():
+                widths[name] = max(widths[name], width)
+            placements[worker_id][unit_id] = (n_rows, remaps)
+            quarantined.extend(unit_quarantine)
+            n_rows += rows
+
+        dtypes: dict[str, str] = {}
+        for name, kind in schema:
+            if kind == CATEGORY:
+                dtypes[name] = _code_dtype(len(merged[name])).str
+            elif kind == STR:
+                dtypes[name] = f"S{widths[name]}"
+            else:
+                dtypes[name] = np.dtype(_NUMERIC_DTYPES[kind]).str
+        nbytes = n_rows * sum(np.dtype(dtype).itemsize for dtype in dtypes.values())
+        store = ColumnStore.create(
+            tempfile.mkdtemp(prefix="columns-", dir=directory or buffer_dir(nbytes)), n_rows, dtypes
+        )
+
+        for worker_placements in placements:
+            for unit_id, (offset, remaps) in worker_placements.items():
+                worker_placements[unit_id] = (
+                    offset,
+                    {name: np.asarray(table, dtype=dtypes[name]) for name, table in remaps.items()},
+                )
+        for (parent, _), worker_placements in zip(pipes, placements):
+            parent.send((str(store.directory), worker_placements))
+        for parent, _ in pipes:
+            error = parent.recv()
+            if error is not None:
+                raise RuntimeError(f"Worker failed while writing rows:\n{error}")
+
+        categories = {name: list(lookup) for name, lookup in merged.items()}
+        return _to_frame(store, schema, categories), quarantined
+    except BaseException:
+        for parent, _ in pipes:
+            try:
+                parent.send((None, None))
+            except (BrokenPipeError, OSError):
+                pass
+        raise
+    finally:
+        for process in processes:
+            process.join(timeout=_POLL_SECONDS)
+            if process.is_alive():
+                process.terminate()
+        if store is not None:
+            store.release()
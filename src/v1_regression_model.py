@@ -1,5 +1,8 @@
 import argparse
+import pathlib
+from typing import Any
 
+import joblib
 import pandas as pd
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, r2_score
@@ -20,8 +23,8 @@ def load_dataset(path: str) -> pd.DataFrame:
     return df.dropna(subset=needed)
 
 
-def train_and_evaluate(df: pd.DataFrame) -> None:
-    """Train GradientBoostingRegressor and print MSE/R^2."""
+def train_and_evaluate(df: pd.DataFrame) -> GradientBoostingRegressor:
+    """Train GradientBoostingRegressor, print MSE/R^2 on a held-out split and return the model."""
     X = df[FEATURE_COLS]
     y = df[TARGET_COL]
 
@@ -36,6 +39,19 @@ def train_and_evaluate(df: pd.DataFrame) -> None:
 
     print("MSE:", mean_squared_error(y_test, y_pred))
     print("R^2:", r2_score(y_test, y_pred))
+    return reg
+
+
+def save_model(model: Any, path: str | pathlib.Path) -> None:
+    """Save a trained model together with the feature columns it expects."""
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump({"model": model, "features": FEATURE_COLS, "target": TARGET_COL}, path)
+
+
+def load_model(path: str | pathlib.Path) -> tuple[Any, list[str]]:
+    """Load a model saved by save_model; returns (model, feature columns in training order)."""
+    payload = joblib.load(path)
+    return payload["model"], list(payload["features"])
 
 
 def main() -> None:
@@ -45,10 +61,18 @@ def main() -> None:
         default="data/club_positions_features.csv",
         help="Path to CSV with feature columns and regression_score target.",
     )
+    parser.add_argument(
+        "--model-out",
+        default=None,
+        help="Optional path to save the trained model (e.g. models/v1.joblib) for src/predict.py.",
+    )
     args = parser.parse_args()
 
     df = load_dataset(args.data)
-    train_and_evaluate(df)
+    model = train_and_evaluate(df)
+    if args.model_out:
+        save_model(model, args.model_out)
+        print(f"Saved model to {args.model_out}.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,436 @@
+"""
+File-based work queue for running make_dataset / evaluate_variables on several hosts.
+
+A coordinator splits the input into work units in a queue directory on a shared filesystem;
+any number of workers, on any hosts, claim units, process them and write one result shard per
+unit; a final merge builds the dataset. Layout:
+
+    queue/
+        queue.json                  stage, stage settings and the list of units
+        leases/unit-00003.lease     held by the worker processing unit 3
+        results/unit-00003.parquet  result shard of a finished unit
+        done/unit-00003.json        written last: rows and quarantined inputs of unit 3
+
+A lease is claimed by creating its file exclusively (O_CREAT | O_EXCL, atomic on local and NFS
+filesystems); it records the worker and a random token identifying this claim. Its holder
+touches it while working; a lease not touched for lease_seconds is expired and any worker may
+reclaim the unit. A worker only touches or removes a lease file that still carries its own
+token. Result shards and done markers are written through per-writer temp files and renamed
+into place, and their content does not depend on the worker, so a unit that ends up processed
+twice (e.g. by a worker that stalled past its lease) is published whole by whichever worker
+renames last.
+
+Usage:
+    PYTHONPATH=. python src/workqueue.py plan-positions --queue /shared/q --pgn data/games.pgn --games-per-unit 2000
+    PYTHONPATH=. python src/workqueue.py work --queue /shared/q          # on every build box
+    PYTHONPATH=. python src/workqueue.py status --queue /shared/q
+    PYTHONPATH=. python src/workqueue.py merge --queue /shared/q --output data/positions
+
+    PYTHONPATH=. python src/workqueue.py plan-features --queue /shared/fq --input data/positions.csv
+"""
+
+import argparse
+import importlib
+import json
+import os
+import pathlib
+import socket
+import threading
+import time
+import uuid
+from typing import Any
+
+import pandas as pd
+
+from src.sampling import PlySampler
+from src.shards import ShardManifest, read_frame, write_frame, write_quarantine
+
+QUEUE_NAME = "queue.json"
+# Stage name -> module providing plan_queue_units / process_queue_unit.
+STAGES = {"positions": "src.make_dataset", "features": "src.evaluate_variables"}
+
+
+def _unit_name(unit_id: int) -> str:
+    return f"unit-{unit_id:05d}"
+
+
+def _write_json(path: pathlib.Path, payload: Any) -> None:
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: pathlib.Path) -> Any:
+    with path.open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def create_queue(
+    queue_dir: str | pathlib.Path,
+    stage: str,
+    settings: dict[str, Any],
+    units: list[dict[str, Any]],
+    *,
+    fmt: str = "parquet",
+) -> None:
+    """
+    Write a new queue of units for stage ("positions" or "features").
+
+    Raises:
+        ValueError: if the stage is unknown or queue_dir already holds a queue.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}'")
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported format '{fmt}'")
+    queue_dir = pathlib.Path(queue_dir)
+    if (queue_dir / QUEUE_NAME).exists():
+        raise ValueError(f"'{queue_dir}' already holds a queue")
+    for name in ("leases", "results", "done"):
+        (queue_dir / name).mkdir(parents=True, exist_ok=True)
+    _write_json(queue_dir / QUEUE_NAME, {"stage": stage, "format": fmt, "settings": settings, "units": units})
+
+
+def plan_positions(
+    queue_dir: str | pathlib.Path,
+    source: str,
+    input_path: str | pathlib.Path,
+    *,
+    games_per_unit: int = 1000,
+    fmt: str = "parquet",
+    max_games: int | None = None,
+    trim_last_moves: int = 0,
+    sampler: PlySampler | None = None,
+    **club_filters: int,
+) -> int:
+    """Coordinator for make_dataset: queue one unit per block of games; returns the unit count."""
+    if sampler is not None and trim_last_moves > 0:
+        raise ValueError("With a sampler, trim through PlySampler(trim_last_moves=...)")
+    module = importlib.import_module(STAGES["positions"])
+    units = module.plan_queue_units(source, input_path, games_per_unit=games_per_unit, max_games=max_games)
+    settings = {
+        "source": source,
+        "input": str(pathlib.Path(input_path).resolve()),
+        "trim_last_moves": trim_last_moves,
+        "sampler": sampler.settings() if sampler is not None else None,
+        **club_filters,
+    }
+    create_queue(queue_dir, "positions", settings, units, fmt=fmt)
+    return len(units)
+
+
+def plan_features(
+    queue_dir: str | pathlib.Path,
+    csv_path: str | pathlib.Path,
+    *,
+    rows_per_unit: int = 50_000,
+    fmt: str = "parquet",
+    max_rows: int | None = None,
+    side_col: str = "side_to_move",
+    fen_col: str = "fen",
+    result_col: str = "result",
+    features: list[str] | None = None,
+) -> int:
+    """Coordinator for evaluate_variables: queue one unit per block of rows; returns the unit count."""
+    module = importlib.import_module(STAGES["features"])
+    units = module.plan_queue_units(csv_path, rows_per_unit=rows_per_unit, max_rows=max_rows)
+    settings = {
+        "input": str(pathlib.Path(csv_path).resolve()),
+        "side_col": side_col,
+        "fen_col": fen_col,
+        "result_col": result_col,
+        "features": features,
+    }
+    create_queue(queue_dir, "features", settings, units, fmt=fmt)
+    return len(units)
+
+
+class _Lease:
+    """An exclusively created lease file, kept fresh by a heartbeat thread while held."""
+
+    def __init__(self, path: pathlib.Path, lease_seconds: float, token: str) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.token = token
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+
+    @classmethod
+    def claim(cls, path: pathlib.Path, worker: str, lease_seconds: float) -> "_Lease | None":
+        """Claim the lease at path, reclaiming it if expired; None if another worker holds it."""
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not cls._take_expired(path, worker, lease_seconds):
+                    return None
+                continue
+            token = uuid.uuid4().hex
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump({"worker": worker, "token": token, "claimed_at": time.time()}, handle)
+            lease = cls(path, lease_seconds, token)
+            lease._thread.start()
+            return lease
+        return None
+
+    @staticmethod
+    def _take_expired(path: pathlib.Path, worker: str, lease_seconds: float) -> bool:
+        """Remove path if its lease expired; True if it is now free to claim."""
+        try:
+            if time.time() - path.stat().st_mtime <= lease_seconds:
+                return False
+            # Renaming is atomic: of several workers reclaiming the same lease, one succeeds.
+            stale = path.with_name(f"{path.name}.expired-{worker}")
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return True
+        if time.time() - stale.stat().st_mtime > lease_seconds:
+            stale.unlink()
+            return True
+        # Another worker re-claimed the unit in between: put its fresh lease back.
+        try:
+            os.link(stale, path)
+        except FileExistsError:
+            pass
+        stale.unlink()
+        return False
+
+    def _owned(self) -> bool:
+        """True if the lease file exists and still carries this claim's token."""
+        try:
+            return _read_json(self.path).get("token") == self.token
+        except (FileNotFoundError, ValueError):
+            # Missing (briefly, while another worker checks it for expiry) or being written.
+            return False
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            if not self._owned():
+                continue
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                continue
+
+    def release(self) -> None:
+        """Stop the heartbeat and remove the lease file, unless another worker has reclaimed it."""
+        self._stop.set()
+        self._thread.join()
+        if self._owned():
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _process(queue_dir: pathlib.Path, spec: dict[str, Any], unit_id: int, worker: str) -> None:
+    module = importlib.import_module(STAGES[spec["stage"]])
+    unit = spec["units"][unit_id]
+    df, quarantined = module.process_queue_unit(unit, spec["settings"])
+    fmt = spec["format"]
+    name = _unit_name(unit_id)
+    write_frame(df, queue_dir / "results" / f"{name}.{fmt}", fmt)
+    _write_json(
+        queue_dir / "done" / f"{name}.json",
+        {"rows": len(df), "quarantined": quarantined, "worker": worker, **unit},
+    )
+
+
+def run_worker(
+    queue_dir: str | pathlib.Path,
+    *,
+    worker: str | None = None,
+    lease_seconds: float = 300.0,
+    poll_seconds: float = 5.0,
+    wait: bool = True,
+) -> int:
+    """
+    Claim and process units until every unit of the queue is done.
+
+    Args:
+        queue_dir: Queue created by plan_positions / plan_features.
+        worker: Worker name recorded in leases and done markers (default: host:pid).
+        lease_seconds: A lease not refreshed for this long is expired and can be reclaimed.
+        poll_seconds: Wait between scans while other workers hold the remaining units.
+        wait: Keep polling while units are leased by others (to reclaim them if their worker
+            dies); if False, return as soon as no unit can be claimed.
+
+    Returns:
+        Number of units processed by this worker.
+    """
+    queue_dir = pathlib.Path(queue_dir)
+    spec = _read_json(queue_dir / QUEUE_NAME)
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+
+    while True:
+        pending = [
+            unit_id
+            for unit_id in range(len(spec["units"]))
+            if not (queue_dir / "done" / f"{_unit_name(unit_id)}.json").exists()
+        ]
+        if not pending:
+            return processed
+
+        claimed_any = False
+        for unit_id in pending:
+            name = _unit_name(unit_id)
+            lease = _Lease.claim(queue_dir / "leases" / f"{name}.lease", worker, lease_seconds)
+            if lease is None:
+                continue
+            try:
+                # Re-check under the lease: another worker may have finished the unit meanwhile.
+                if not (queue_dir / "done" / f"{name}.json").exists():
+                    _process(queue_dir, spec, unit_id, worker)
+                    processed += 1
+            finally:
+                lease.release()
+            claimed_any = True
+
+        if not claimed_any:
+            if not wait:
+                return processed
+            time.sleep(poll_seconds)
+
+
+def queue_status(queue_dir: str | pathlib.Path) -> dict[str, int]:
+    """Counts of done, leased and pending units."""
+    queue_dir = pathlib.Path(queue_dir)
+    spec = _read_json(queue_dir / QUEUE_NAME)
+    counts = {"units": len(spec["units"]), "done": 0, "leased": 0, "pending": 0}
+    for unit_id in range(len(spec["units"])):
+        name = _unit_name(unit_id)
+        if (queue_dir / "done" / f"{name}.json").exists():
+            counts["done"] += 1
+        elif (queue_dir / "leases" / f"{name}.lease").exists():
+            counts["leased"] += 1
+        else:
+            counts["pending"] += 1
+    return counts
+
+
+def merge_queue(queue_dir: str | pathlib.Path, output: str | pathlib.Path) -> int:
+    """
+    Build the final dataset from a finished queue; returns the number of rows.
+
+    A .csv or .parquet output is written as one file (with <output>.quarantine.jsonl if any
+    inputs were quarantined). Any other output is a sharded dataset directory (readable with
+    shards.read_sharded): the result shards are moved into it, one shard per unit, which needs
+    the queue and the output on the same filesystem.
+
+    Raises:
+        ValueError: if some units are not done yet.
+    """
+    queue_dir = pathlib.Path(queue_dir)
+    output = pathlib.Path(output)
+    spec = _read_json(queue_dir / QUEUE_NAME)
+    fmt = spec["format"]
+    names = [_unit_name(unit_id) for unit_id in range(len(spec["units"]))]
+    missing = [name for name in names if not (queue_dir / "done" / f"{name}.json").exists()]
+    if missing:
+        raise ValueError(f"{len(missing)} of {len(names)} units are not done (first: {missing[0]})")
+
+    if output.suffix.lower() in (".csv", ".parquet"):
+        frames: list[pd.DataFrame] = []
+        quarantined: list[dict] = []
+        for name in names:
+            frames.append(read_frame(queue_dir / "results" / f"{name}.{fmt}"))
+            quarantined.extend(_read_json(queue_dir / "done" / f"{name}.json")["quarantined"])
+        df = pd.concat(frames, ignore_index=True)
+        write_frame(df, output, output.suffix.lower().lstrip("."))
+        if quarantined:
+            write_quarantine(quarantined, f"{output}.quarantine.jsonl")
+        return len(df)
+
+    manifest = ShardManifest.open(output, {"stage": spec["stage"], "format": fmt, **spec["settings"]})
+    for shard_id, name in enumerate(names):
+        done = _read_json(queue_dir / "done" / f"{name}.json")
+        quarantined = done.pop("quarantined")
+        done.pop("worker", None)
+        rows = done.pop("rows")
+        result = queue_dir / "results" / f"{name}.{fmt}"
+        if rows:
+            manifest.adopt(shard_id, result, fmt, rows=rows, quarantined=quarantined, **done)
+        else:
+            manifest.commit(shard_id, pd.DataFrame(), fmt, quarantined=quarantined, **done)
+    manifest.finish()
+    return manifest.rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distributed make_dataset / evaluate_variables runs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    positions = commands.add_parser("plan-positions", help="Queue a make_dataset build.")
+    source = positions.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pgn", help="Path to PGN file.")
+    source.add_argument("--csv", help="Path to CSV file with SAN moves.")
+    source.add_argument("--club-csv", help="Path to Chess.com club CSV.")
+    positions.add_argument("--games-per-unit", type=int, default=1000, help="Input games per work unit.")
+    positions.add_argument("--max-games", type=int, default=None, help="Optional limit on games to parse.")
+    positions.add_argument("--trim-last-moves", type=int, default=0, help="Drop the last N moves of each game.")
+
+    features = commands.add_parser("plan-features", help="Queue an evaluate_variables run.")
+    features.add_argument("--input", required=True, help="Positions CSV with side_to_move, fen and result.")
+    features.add_argument("--rows-per-unit", type=int, default=50_000, help="Input rows per work unit.")
+    features.add_argument("--max-rows", type=int, default=None, help="Optional limit on rows to evaluate.")
+    features.add_argument("--features", default=None, help="Comma-separated feature names to compute.")
+
+    for plan in (positions, features):
+        plan.add_argument("--queue", required=True, help="Queue directory (on a shared filesystem).")
+        plan.add_argument("--format", choices=["csv", "parquet"], default="parquet", help="Result shard format.")
+
+    work = commands.add_parser("work", help="Process units until the queue is done.")
+    work.add_argument("--queue", required=True, help="Queue directory.")
+    work.add_argument("--worker", default=None, help="Worker name (default: host:pid).")
+    work.add_argument("--lease-seconds", type=float, default=300.0, help="Lease expiry without heartbeat.")
+    work.add_argument("--no-wait", action="store_true", help="Exit when no unit can be claimed right now.")
+
+    status = commands.add_parser("status", help="Show queue progress.")
+    status.add_argument("--queue", required=True, help="Queue directory.")
+
+    merge = commands.add_parser("merge", help="Build the dataset from a finished queue.")
+    merge.add_argument("--queue", required=True, help="Queue directory.")
+    merge.add_argument("--output", required=True, help="Output .csv/.parquet file or sharded dataset directory.")
+
+    args = parser.parse_args()
+
+    if args.command == "plan-positions":
+        source_name, input_path = (
+            ("pgn", args.pgn) if args.pgn else ("csv", args.csv) if args.csv else ("club-csv", args.club_csv)
+        )
+        n_units = plan_positions(
+            args.queue,
+            source_name,
+            input_path,
+            games_per_unit=args.games_per_unit,
+            fmt=args.format,
+            max_games=args.max_games,
+            trim_last_moves=args.trim_last_moves,
+        )
+        print(f"Queued {n_units} units in {args.queue}.")
+    elif args.command == "plan-features":
+        n_units = plan_features(
+            args.queue,
+            args.input,
+            rows_per_unit=args.rows_per_unit,
+            fmt=args.format,
+            max_rows=args.max_rows,
+            features=args.features.split(",") if args.features else None,
+        )
+        print(f"Queued {n_units} units in {args.queue}.")
+    elif args.command == "work":
+        processed = run_worker(
+            args.queue, worker=args.worker, lease_seconds=args.lease_seconds, wait=not args.no_wait
+        )
+        print(f"Processed {processed} units.")
+    elif args.command == "status":
+        print(json.dumps(queue_status(args.queue)))
+    else:
+        rows = merge_queue(args.queue, args.output)
+        print(f"Merged {rows} rows into {args.output}.")
+
+
+if __name__ == "__main__":
+    main()